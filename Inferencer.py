@@ -1,183 +1,205 @@
 import ast
 from typespy import *
 from utils import *
+from rules import compile_rules, DEFAULT_RULES
+from prelude import BUILTINS
+from arena import TypeArena
+from tracing import Tracer, TracedSubst
+from snapshot import Snapshot
+from memo import ExprMemo
+
+'''
+Inferencer(hint, rules, env, prelude): one engine for every variant of the inference rules.
+
+rules names the rule modules to enable (see rules/), they are compiled into a single
+dispatch table here so infer() is one dict lookup per node:
+    Inferencer(rules=("core", "dict_access", "annotations", "union_values"))
+hint holds per-key value types for dict literals, env seeds the type environment:
+    Inferencer(hint={"key1": TStr()}, env={"my_config": TDict(TStr(), TInt())})
+Names missing from env are looked up in prelude (builtins and some stdlib, see prelude.py),
+pass prelude=None to turn that off. modules resolves imports of the modules under a source
+root, each one is inferred on the first lookup of one of its names (see modules.py), and
+module is the dotted name of the module being inferred, for relative imports:
+    Inferencer(rules=RULES, modules=ModuleLoader("path/to/repo"), module="pkg.mod")
+
+infer(node) synthesizes a type bottom-up. check(node, expected) pushes a known type down,
+e.g. the annotated return type of a function into its body, and falls back to infer() and
+unify() for nodes that have no check rule.
+
+compact() resolves env and drops the substitution entries nothing can reach any more, so
+memory follows the live bindings instead of the whole history. infer_module(tree) runs the
+top-level statements of a module and compacts after each one. finalize() instead resolves
+the whole env in one go at the end. finalize(use_arena=True) does it on the NumPy type arena
+(see arena.py), which only pays off for long chains of variables bound to variables, e.g.
+generated code passing values through hundreds of lambdas, see arenabench.py.
+
+snapshot() captures env, subst, function_retrieves_from and the variable supply, restore()
+starts another Inferencer from it, see snapshot.py. A shared base is inferred once that way.
+
+Inferencer(memo=True) reuses the type of a repeated subexpression, e.g. the same lambda or
+my_config.get("k") all over a generated module, instead of inferring it again (see memo.py).
+
+Concurrency: all inference state (env, subst, the variable supply, the tracer, the memo) belongs to
+one Inferencer, so threads can infer different modules in one process, each with its own
+Inferencer, without any locking. An Inferencer itself must not be used by two threads at
+once. What the instances share is read-only or guarded: the compiled rule modules, the
+prelude (loaded under a lock), snapshots and module loaders. Types are never mutated,
+so sharing them between instances is safe. See stress.py.
+
+Inferencer(trace=True) records unification events into a bounded ring buffer (see
+tracing.py), explain(name) then tells why name got its type. Without trace nothing is
+wrapped, so tracing costs nothing when it is off.
+'''
+
 class Inferencer:
-    def __init__(self,hint=None):
-        self.env = TypeEnv()
+    def __init__(self, hint=None, rules=DEFAULT_RULES, env=None, prelude=BUILTINS, trace=False, memo=False,
+                 modules=None, module=None):
+        self.env = TypeEnv(env or {})
+        self.prelude = prelude
+        self.modules = modules
+        self.module = module
+        self.imports = {} # imported name -> (module, member or None for the module itself)
         self.subst = {}
-        self.hint=hint
+        self.hint = hint
         self.function_retrieves_from = {}
-            # print(self.env)
+        self._holders = {} # type variable -> env names whose resolved type mentions it
+        self.next_var = 0  # id of the next fresh variable, numbering is per Inferencer
+        self.rules = tuple(rules)
+        self._dispatch, self._check_dispatch = compile_rules(self.rules, Inferencer.subsume)
+        self.memo = None
+        if memo:
+            self.memo = ExprMemo()
+            self._dispatch = self.memo.wrap_table(self._dispatch)
+        self.tracer = None
+        if trace:
+            self.tracer = trace if isinstance(trace, Tracer) else Tracer()
+            self.subst = TracedSubst(self.tracer)
+            self._dispatch = {key: self.tracer.wrap(h) for key, h in self._dispatch.items()}
+            self._check_dispatch = {key: self.tracer.wrap(h) for key, h in self._check_dispatch.items()}
+
     def fresh_var(self):
-        return TVar()
+        v = TVar(id=self.next_var)
+        self.next_var += 1
+        return v
 
     def infer(self, node, env=None):
         if env is None:
             env = self.env
-
-        if isinstance(node, ast.Num):
-            return TInt()
-        elif isinstance(node, ast.Constant):
-            if isinstance(node.value, int):
-                return TInt()
-            elif isinstance(node.value, bool):
-                return TBool()
-            elif isinstance(node.value, str):
-                return TStr()
-            else:
-                raise Exception("Unknown literal type")
-        elif isinstance(node, ast.Name):
-            if node.id in env:
-                # print("env name: ", node.id, env)
-                return env[node.id]
-            else:
-                raise Exception(f"Unbound variable {node.id}")
-        elif isinstance(node, ast.BinOp):  #breaks the binary operation into left and right part and calls infer recursively for both, with current env until the rudimentary type is returned(tvar, int, str ...)
-            # print("bin opt inside", node.left, node.right, env)
-            left = self.infer(node.left, env)
-            right = self.infer(node.right, env)
-            # print("binop after: ", left, right, self.subst )
-            unify(left, TInt(), self.subst) 
-            unify(right, TInt(), self.subst)
-            # print("before binop return: ", left)
-            return TInt()
-        elif isinstance(node, ast.Lambda):
-            # print("lambda inside")
-
-            arg_name = node.args.args[0].arg
-            arg_type = self.fresh_var()
-            new_env = env.clone()
-            new_env[arg_name] = arg_type
-            body_type = self.infer(node.body, new_env)
-            # print("checking self subst before applying: ",self.subst)
-            return TFun(apply_subst(arg_type, self.subst), apply_subst(body_type, self.subst))
-        elif isinstance(node, ast.Call):
-            # Special case: dict.get(key)
-            # print("dict obj fdgffg", ast.dump(node), env)
-
-            if isinstance(node.func, ast.Attribute) and node.func.attr == "get": #this part visited for function definition which includes retrieving dictionary value using get(),
-                dict_obj = node.func.value
-                # print("dict obj ", ast.dump(node), env)
-                dict_type = self.infer(dict_obj, env)
-                # print("dict type: ", dict_type)
-                if isinstance(dict_type, TDict):
-                    key_type = self.infer(node.args[0], env)
-                    unify(key_type, dict_type.key_type, self.subst)
-                    dict_type=apply_subst(dict_type.value_type, self.subst)
-                    return dict_type
-                else:
-                    raise Exception(f".get called on non-dictionary type: {dict_type}")
-
-            func_type = self.infer(node.func, env)
-            arg_type = self.infer(node.args[0], env)
-            ret_type = self.fresh_var()
-            # print("values after return: ", func_type, TFun(arg_type, ret_type), self.subst)
-            unify(func_type, TFun(arg_type, ret_type), self.subst)
-            # print("values after return unify: ", func_type, TFun(arg_type, ret_type), self.subst)
-
-            if (isinstance(node.func, ast.Name) and #this part is visited on calling the function which returns dict 
-                len(node.args) == 1 and 
-                isinstance(node.args[0], ast.Str)):
-                print("function name", ast.dump(node))
-                func_name = node.func.id
-                if func_name in self.function_retrieves_from: #checking if function retrieve has value, it links the function to dict which is to be returned, then it should have been stored in env along with hint which stores the corresponding types for each keys
-                    dict_name = self.function_retrieves_from[func_name]
-                    # print("dict name from function retrieve", dict_name, self.function_retrieves_from,env)
-                    if dict_name in env:
-                        dict_type = env[dict_name]
-                        if isinstance(dict_type, TDict) and dict_type.hint:
-                            key = node.args[0].s
-                            if key in dict_type.hint:
-                                return dict_type.hint[key]
-            return apply_subst(ret_type, self.subst)
-
-        elif isinstance(node, ast.FunctionDef): #works for only one arg. First takes arg, generates fresh type for the arg and adds to env. Then calls infer recursively for the body part with new env context(details about arg). Retrieves type of arg as self.subst(env) and finally generates t0->t1
-            # print("functiondef inside", ast.dump(node), len(node.body))
-            if len(node.body) == 1 and isinstance(node.body[0], ast.Return): #this part checks the function definition for which the body might return values got from dictionary. It requires calling function using get to retrieve value from dictionary or accessing directly which uses subscript
-                ret_expr = node.body[0].value
-                if ret_expr is not None:
-                    if (isinstance(ret_expr, ast.Call) and
-                        isinstance(ret_expr.func, ast.Attribute) and
-                        ret_expr.func.attr == "get" and
-                        isinstance(ret_expr.func.value, ast.Name)):
-                        # print("ret_exp, call attribute", ast.dump(node))
-
-                        dict_name = ret_expr.func.value.id #gets id of element(Name, int ... here name of dict ) contained in body to be returned from function
-                        self.function_retrieves_from[node.name] = dict_name #extracts name of current function
-                        # print("dict name function retrieves from", dict_name, node.name)
-                    elif isinstance(ret_expr, ast.Subscript):
-                        # print("dict obj d", ast.dump(ret_expr), ret_expr.value.id, node.name)
-                        dict_name = ret_expr.value.id #extracts name of element, here dict
-                        self.function_retrieves_from[node.name] = dict_name 
-                        # print("dict name function retrieves from for subscript", dict_name, node.name)
-
-            # print("ast for def function: ", ast.dump(node))   
-            #extract argument and create fresh type for argument and store in environment        
-            arg_name = node.args.args[0].arg
-            arg_type = self.fresh_var()
-            new_env = env.clone()
-            new_env[arg_name] = arg_type
-            #infer type for body using new env after argument work
-            body_type = self.infer(node.body[0].value, new_env)  
-
-            # print("inferring ",arg_type, self.subst, body_type)
-            func_type = TFun(apply_subst(arg_type, self.subst), apply_subst(body_type, self.subst))
-            env[node.name] = func_type
-            # print("replacing env before call",func_type, node.name, env)
-            return func_type
-        elif isinstance(node, ast.Assign):
-            assert len(node.targets) == 1, "Only single assignments supported"
-            target = node.targets[0]
-            if not isinstance(target, ast.Name):
-                raise Exception("Only simple name assignments supported")
-            value_type = self.infer(node.value, env)
-            env[target.id] = value_type
-            return value_type
-        elif isinstance(node, ast.Dict):
-            # print("before inference dict: ", env)
-            key_types = []
-            value_types = []
-            for k, v in zip(node.keys, node.values):
-                kt = self.infer(k, env)
-                vt = self.infer(v, env)
-                key_types.append(kt)
-                value_types.append(vt)
-            # unify all key types (assuming same key type, e.g., str)
-            key_type = key_types[0]
-            for kt in key_types[1:]:
-                unify(kt, key_type, self.subst)
-
-            # compute union of value types
-            def make_union(types):
-                unique = []
-                for t in types:
-                    # print("make values ",t,self.subst)
-                    t_applied = apply_subst(t, self.subst)
-                    # print("subst",t_applied,self.subst)
-                    if not any(t_applied == u for u in unique): #save only unique, similar to not t_applied in set(unique)
-                        unique.append(t_applied)
-                if len(unique) == 1:
-                    return unique[0]
-                else:
-                    return TUnion(unique)
-
-            value_type = make_union(value_types)
-            # print("after inference dict: ",self.subst, env, value_type)
-            return TDict(apply_subst(key_type, self.subst), value_type, self.hint)
-        elif isinstance(node, ast.Subscript):
-            dict_obj = node.value # extract ast of type contained in subscript, here dict(my_config)
-            # print("dict obj subscript ", ast.dump(node), env)
-            dict_type = self.infer(dict_obj, env)
-            # print("dict type: ", dict_type, self.subst)
-            if isinstance(dict_type, TDict):
-                key_type = self.infer(node.slice, env) #infers type for argument/slice sent 
-                unify(key_type, dict_type.key_type, self.subst) #unifying the dict key type and argument(key) for my_config dict
-                # print("after subscript key typing", key_type, dict_type.key_type, dict_type.value_type, self.subst)
-                new_apply = apply_subst(dict_type.value_type, self.subst)
-                # print("returning type of dict ", new_apply)
-                return new_apply
-                #  return apply_subst(dict_type.value_type, self.subst)
-            else:
-                raise Exception(f".get called on non-dictionary type: {dict_type}")
-        else:
+        handler = self._dispatch.get(type(node))
+        if handler is None:
             raise Exception(f"Unknown AST node: {ast.dump(node)}")
+        return handler(self, node, env)
+
+    def check(self, node, expected, env=None):
+        if env is None:
+            env = self.env
+        handler = self._check_dispatch.get(type(node))
+        if handler is None:
+            return self.subsume(node, expected, env)
+        return handler(self, node, expected, env)
+
+    def subsume(self, node, expected, env):
+        actual = self.infer(node, env)
+        expected = apply_subst(expected, self.subst)
+        if isinstance(expected, TUnion) and not isinstance(actual, TUnion):
+            # a member of the union is fine as is, e.g. a str returned as str | int. Base types
+            # match by class, a dict or a function has to unify with the member, which is
+            # tried on a copy of subst first so a member that does not fit leaves no trace
+            actual = apply_subst(actual, self.subst)
+            if isinstance(actual, (TInt, TBool, TStr, TNone)):
+                if any(type(actual) == type(option) for option in expected.options):
+                    return expected
+            elif not isinstance(actual, TVar):
+                for option in expected.options:
+                    if type(actual) != type(option):
+                        continue
+                    try:
+                        unify_nested(actual, option, dict(self.subst))
+                    except Exception:
+                        continue
+                    unify_nested(actual, option, self.subst)
+                    return apply_subst(expected, self.subst)
+        unify(actual, expected, self.subst)
+        return apply_subst(expected, self.subst)
+
+    def declared_return(self, node, env):
+        # the declared return type of a FunctionDef/Lambda, None when nothing is declared
+        return self._dispatch["returns"](self, node, env)
+
+    def compact(self, roots=()):
+        # only names written since the last compaction and names whose type mentions a
+        # variable bound since then can be stale, every other env entry is already resolved
+        subst = self.subst
+        env = self.env
+        stale = env.written
+        env.written = set()
+        for v in subst:
+            stale.update(self._holders.pop(v, ()))
+        for name in stale:
+            if name in env:
+                t = apply_subst(env[name], subst)
+                dict.__setitem__(env, name, t)
+                for v in free_vars(t, set()):
+                    self._holders.setdefault(v, set()).add(name)
+
+        # env is resolved now, so only roots (types the caller still holds on to) and the
+        # hint can reach subst, keep what they reach by following chains through subst
+        pending = set()
+        for t in roots:
+            free_vars(t, pending)
+        if self.hint:
+            for t in self.hint.values():
+                free_vars(t, pending)
+        live = {}
+        while pending:
+            v = pending.pop()
+            if v in subst and v not in live:
+                live[v] = subst[v]
+                free_vars(subst[v], pending)
+        subst.clear()
+        subst.update(live)
+        return len(subst)
+
+    def infer_module(self, tree, compact=True):
+        for stmt in tree.body:
+            inferred_type = self.infer(stmt)
+            if compact:
+                self.compact((inferred_type,))
+            yield stmt, inferred_type
+
+    def finalize(self, use_arena=False):
+        # resolve every env entry at once, with use_arena all variables of the module in bulk
+        if not (use_arena and TypeArena.available):
+            for name, t in self.env.items():
+                dict.__setitem__(self.env, name, apply_subst(t, self.subst))
+            return self.env
+        arena = TypeArena(max(1024, 4 * (len(self.env) + len(self.subst))))
+        handles = {name: arena.add(t) for name, t in self.env.items()}
+        arena.bind_subst(self.subst)
+        arena.resolve()
+        arena.check_cycles()
+        memo = {}
+        for name, h in handles.items():
+            dict.__setitem__(self.env, name, arena.to_type(h, memo))
+        return self.env
+
+    def snapshot(self):
+        return Snapshot.capture(self)
+
+    def restore(self, snapshot):
+        # env comes back resolved, so nothing is stale for the next compact()
+        env, subst, function_retrieves_from, imports, holders, next_var = snapshot.state()
+        self.env = TypeEnv(env)
+        self.env.written = set()
+        self.subst.clear()
+        self.subst.update(subst)
+        self.function_retrieves_from = dict(function_retrieves_from)
+        self.imports = dict(imports)
+        self._holders = {v: set(names) for v, names in holders.items()}
+        self.next_var = max(self.next_var, next_var)
+        return self
+
+    def explain(self, name):
+        if self.tracer is None:
+            raise Exception("explain() needs an Inferencer created with trace=True")
+        return "\n".join(self.tracer.explain(name))
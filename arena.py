@@ -0,0 +1,183 @@
+from typespy import *
+
+try:
+    import numpy as np
+except ImportError:  # the arena is optional, Inferencer.finalize falls back to apply_subst
+    np = None
+
+'''
+TypeArena: types stored as integer handles into parallel NumPy arrays instead of linked objects.
+
+    tag[h]     what node h is (VAR, INT, ..., FUN, DICT, LIST, UNION)
+    left[h]    FUN: arg, DICT: key, LIST: elem, UNION: offset into members
+    right[h]   FUN: ret, DICT: value, UNION: number of members
+    bind[h]    VAR: handle it is bound to, -1 when unbound
+
+Base types are interned, so every int in a module is the same handle. Once a module's env
+and subst are loaded, resolve() settles every variable at once with vectorized pointer
+jumping, and check_cycles() does the occurs check for all of them in a few bulk passes:
+
+arena = TypeArena()
+h = arena.add(TFun(a, b)); arena.bind_subst({a: TInt(), b: a})
+arena.resolve(); arena.to_type(h)
+→ (int -> int)
+'''
+
+VAR, INT, STR, BOOL, NONE, FUN, DICT, LIST, UNION = range(9)
+_BASE_TAGS = {TInt: INT, TStr: STR, TBool: BOOL, TNone: NONE}
+_BASE_TYPES = {tag: cls for cls, tag in _BASE_TAGS.items()}
+
+
+class TypeArena:
+    available = np is not None
+
+    def __init__(self, capacity=1024):
+        if np is None:
+            raise ImportError("TypeArena needs numpy")
+        self.size = 0
+        self.tag = np.zeros(capacity, dtype=np.int8)
+        self.left = np.zeros(capacity, dtype=np.int32)
+        self.right = np.zeros(capacity, dtype=np.int32)
+        self.bind = np.full(capacity, -1, dtype=np.int32)
+        self.members = np.zeros(capacity, dtype=np.int32)
+        self.members_size = 0
+        self.vars = {}       # TVar -> handle
+        self.var_objs = {}   # handle -> TVar
+        self.hints = {}      # DICT handle -> TDict.hint
+        self.base = {}       # interned base type handles
+        self.resolved = False
+
+    def _grow(self, needed):
+        capacity = len(self.tag)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("tag", "left", "right"):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros(capacity - len(array), dtype=array.dtype)]))
+        self.bind = np.concatenate([self.bind, np.full(capacity - len(self.bind), -1, dtype=np.int32)])
+
+    def _new(self, tag, left=0, right=0):
+        self._grow(self.size + 1)
+        h = self.size
+        self.tag[h] = tag
+        self.left[h] = left
+        self.right[h] = right
+        self.size += 1
+        return h
+
+    def add(self, t: Type) -> int:
+        if isinstance(t, TVar):
+            h = self.vars.get(t)
+            if h is None:
+                h = self.vars[t] = self._new(VAR)
+                self.var_objs[h] = t
+            return h
+        elif isinstance(t, TFun):
+            return self._new(FUN, self.add(t.arg), self.add(t.ret))
+        elif isinstance(t, TDict):
+            h = self._new(DICT, self.add(t.key_type), self.add(t.value_type))
+            if t.hint:
+                self.hints[h] = t.hint
+            return h
+        elif isinstance(t, TList):
+            return self._new(LIST, self.add(t.elem_type))
+        elif isinstance(t, TUnion):
+            options = [self.add(o) for o in t.options]
+            needed = self.members_size + len(options)
+            if needed > len(self.members):
+                self.members = np.concatenate([self.members, np.zeros(max(needed, 2 * len(self.members)), dtype=np.int32)])
+            self.members[self.members_size:needed] = options
+            h = self._new(UNION, self.members_size, len(options))
+            self.members_size = needed
+            return h
+        tag = _BASE_TAGS.get(type(t))
+        if tag is None:
+            raise Exception(f"Type not supported by the arena: {t}")
+        if tag not in self.base:
+            self.base[tag] = self._new(tag)
+        return self.base[tag]
+
+    def bind_subst(self, subst: dict):
+        for v, t in subst.items():
+            self.bind[self.add(v)] = self.add(t)
+        self.resolved = False
+
+    def resolve(self):
+        '''Point every variable and every child straight at its representative, all at once.'''
+        n = self.size
+        idx = np.arange(n, dtype=np.int32)
+        bind = self.bind[:n]
+        rep = np.where((self.tag[:n] == VAR) & (bind >= 0), bind, idx)
+        # pointer jumping: after k rounds every chain of length up to 2**k is collapsed
+        for _ in range(max(1, n).bit_length() + 1):
+            jumped = rep[rep]
+            if np.array_equal(jumped, rep):
+                break
+            rep = jumped
+        else:
+            raise Exception("Recursive unification")
+        tag = self.tag[:n]
+        has_left = (tag == FUN) | (tag == DICT) | (tag == LIST)
+        has_right = (tag == FUN) | (tag == DICT)
+        self.left[:n] = np.where(has_left, rep[self.left[:n]], self.left[:n])
+        self.right[:n] = np.where(has_right, rep[self.right[:n]], self.right[:n])
+        m = self.members_size
+        self.members[:m] = rep[self.members[:m]]
+        self.rep = rep
+        self.resolved = True
+        return rep
+
+    def check_cycles(self):
+        '''Bulk occurs check: a constructor that can reach itself through its children is recursive.'''
+        if not self.resolved:
+            self.resolve()
+        n = self.size
+        tag = self.tag[:n]
+        left = self.left[:n]
+        right = self.right[:n]
+        done = tag < FUN  # variables and base types are leaves
+        unions = np.nonzero(tag == UNION)[0]
+        m = self.members_size
+        while True:
+            ready = done.copy()
+            ready |= ((tag == FUN) | (tag == DICT)) & done[left] & done[right]
+            ready |= (tag == LIST) & done[left]
+            if len(unions) and m:
+                member_done = done[self.members[:m]]
+                starts = left[unions]
+                ok = np.logical_and.reduceat(member_done, starts) if len(starts) else []
+                ready[unions] = ok
+            if np.array_equal(ready, done):
+                break
+            done = ready
+        if not done.all():
+            raise Exception("Recursive unification")
+
+    def to_type(self, h: int, memo=None) -> Type:
+        if memo is None:
+            memo = {}
+        if self.resolved:
+            h = int(self.rep[h])
+        if h in memo:
+            return memo[h]
+        tag = int(self.tag[h])
+        if tag == VAR:
+            t = self.var_objs[h]
+        elif tag == FUN:
+            t = TFun(self.to_type(int(self.left[h]), memo), self.to_type(int(self.right[h]), memo))
+        elif tag == DICT:
+            t = TDict(self.to_type(int(self.left[h]), memo), self.to_type(int(self.right[h]), memo), self.hints.get(h))
+        elif tag == LIST:
+            t = TList(self.to_type(int(self.left[h]), memo))
+        elif tag == UNION:
+            start, count = int(self.left[h]), int(self.right[h])
+            t = TUnion([self.to_type(int(o), memo) for o in self.members[start:start + count]])
+        else:
+            t = _BASE_TYPES[tag]()
+        memo[h] = t
+        return t
+
+    def nbytes(self):
+        return self.tag.nbytes + self.left.nbytes + self.right.nbytes + self.bind.nbytes + self.members.nbytes
@@ -0,0 +1,90 @@
+import ast
+import re
+from chunking import PLACEHOLDER, extract_stub
+
+BATCH_INSTRUCTIONS = """This time there are {count} python files, each between a "### FILE: <name>" line and a "### END FILE" line.
+Answer every file separately: start its answer with a line "### STUB: <name>" using the same name, then give its stub file and remarks exactly as asked above.
+"""
+
+
+def estimate_tokens(text):
+    """Rough token count, about four characters per token for code and English."""
+    return len(text) // 4 + 1
+
+
+def pack(items, budget_tokens, overhead_tokens=0):
+    """
+    Group (name, source) items into batches whose sources fit in budget_tokens together
+    with overhead_tokens of preamble. An item too big for any batch gets a batch of its own.
+    """
+    batches, current, used = [], [], overhead_tokens
+    for name, source in items:
+        size = estimate_tokens(source) + 16  # the delimiter lines around every file
+        if current and used + size > budget_tokens:
+            batches.append(current)
+            current, used = [], overhead_tokens
+        current.append((name, source))
+        used += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def batch_prompt(template, items):
+    """One prompt for several files: the template preamble once, then the delimited sources."""
+    sections = [BATCH_INSTRUCTIONS.format(count=len(items))]
+    for name, source in items:
+        sections.append(f"### FILE: {name}\n{source}\n### END FILE")
+    return template.replace(PLACEHOLDER, "\n".join(sections))
+
+
+def split_response(response, names):
+    """
+    Cut a batched answer back into {name: answer}. A file is missing from the result when
+    its section is absent or its stub is not valid python.
+    """
+    wanted = set(names)
+    headers = list(re.finditer(r"^#+\s*STUB:\s*(.+?)\s*$", response, re.MULTILINE))
+    results = {}
+    for i, header in enumerate(headers):
+        name = header.group(1).strip("`*")
+        if name not in wanted:
+            continue
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(response)
+        answer = response[header.end():end].strip()
+        try:
+            ast.parse(extract_stub(answer))
+        except SyntaxError:
+            continue
+        results[name] = answer
+    return results
+
+
+def infer_batched(items, template, complete, budget_tokens=6000):
+    """
+    Infer stubs for many small (name, source) items with as few requests as possible.
+
+    Items are packed into batched prompts through complete(prompt) -> response. Files whose
+    section is missing or broken, or whose batch request failed, are re-sent one by one with
+    the normal single-file prompt. Returns {name: answer}, an item whose single request fails
+    too gets the exception instead of an answer, so run_pipeline records it as that file's
+    failure (see pipeline.py).
+    """
+    overhead = estimate_tokens(template) + estimate_tokens(BATCH_INSTRUCTIONS)
+    results = {}
+    for batch in pack(items, budget_tokens, overhead):
+        if len(batch) > 1:
+            try:
+                response = complete(batch_prompt(template, batch))
+            except Exception:
+                # complete() counts the failed request, its files are sent one by one below
+                response = None
+            if response is not None:
+                results.update(split_response(response, [name for name, _ in batch]))
+        for name, source in batch:
+            if name not in results:
+                try:
+                    results[name] = complete(template.replace(PLACEHOLDER, source))
+                except Exception as e:
+                    results[name] = e
+    return results
@@ -0,0 +1,279 @@
+import ast
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+PLACEHOLDER = "{Contents to be added from a python file}"
+CONTEXT_HEADER = "# Context from the rest of this module (do not generate stubs for it):"
+
+
+def split_prompt(prompt, template):
+    """Recover the python source that generate_task_file spliced into the template, None if it was not."""
+    prefix, suffix = template.split(PLACEHOLDER)
+    if not prompt.startswith(prefix) or not prompt.endswith(suffix):
+        return None
+    return prompt[len(prefix):len(prompt) - len(suffix)]
+
+
+def _signature(node):
+    """One-line summary of a top-level definition, e.g. 'def f(a, b): ...'."""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+        returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+        return [f"{prefix} {node.name}({ast.unparse(node.args)}){returns}: ..."]
+    if isinstance(node, ast.ClassDef):
+        bases = ", ".join(ast.unparse(b) for b in node.bases)
+        lines = [f"class {node.name}({bases}):" if bases else f"class {node.name}:"]
+        for item in node.body:
+            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                lines += ["    " + line for line in _signature(item)]
+        return lines
+    return []
+
+
+def _decorators(node):
+    return ["@" + ast.unparse(d) for d in getattr(node, "decorator_list", [])]
+
+
+def _first_line(node):
+    """The line a definition starts on, its first decorator's when it has any."""
+    return min([d.lineno for d in getattr(node, "decorator_list", [])] + [node.lineno])
+
+
+def _references(node):
+    """Every name and attribute a piece of code mentions, the candidates for its context."""
+    return {n.id if isinstance(n, ast.Name) else n.attr
+            for n in ast.walk(node) if isinstance(n, (ast.Name, ast.Attribute))}
+
+
+def _defines(node, prefix=""):
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return {prefix + node.name}
+    if isinstance(node, ast.ClassDef):
+        return {node.name} | {n for item in node.body for n in _defines(item, node.name + ".")}
+    return set()
+
+
+def _unit(text, node):
+    return text, _defines(node), _references(node)
+
+
+def _class_parts(node, source_lines, max_chars):
+    """Split an oversized class into pieces that each repeat the class header."""
+    # decorators such as @dataclass change what the class is and its annotated fields make
+    # up the constructor of a dataclass, so every piece keeps both
+    header = source_lines[_first_line(node) - 1:_first_line(node.body[0]) - 1]
+    for item in node.body:
+        if isinstance(item, ast.AnnAssign):
+            header += source_lines[item.lineno - 1:item.end_lineno]
+    pieces, current, size = [], [], 0
+    for item in node.body:
+        if isinstance(item, ast.AnnAssign):
+            continue
+        text = "\n".join(source_lines[_first_line(item) - 1:item.end_lineno])
+        if current and size + len(text) > max_chars:
+            pieces.append(current)
+            current, size = [], 0
+        current.append((text, item))
+        size += len(text)
+    if current:
+        pieces.append(current)
+    units = []
+    for piece in pieces:
+        defined, references = {node.name}, set()
+        for _, item in piece:
+            defined |= _defines(item, node.name + ".")
+            references |= _references(item)
+        units.append(("\n".join(header + [text for text, _ in piece]), defined, references))
+    return units
+
+
+class _Context:
+    """Signatures of the module's definitions, picked per chunk by what the chunk mentions."""
+
+    def __init__(self):
+        self.functions = {}  # name -> signature lines, its decorators first
+        self.classes = {}    # name -> (header lines, {method name: signature lines})
+
+    def add(self, node):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            self.functions[node.name] = _decorators(node) + _signature(node)[:1]
+        elif isinstance(node, ast.ClassDef):
+            methods = {item.name: _decorators(item) + _signature(item)[:1] for item in node.body
+                       if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))}
+            self.classes[node.name] = (_decorators(node) + _signature(node)[:1], methods)
+
+    def lines(self, defined, references):
+        # only what the chunk refers to and does not define itself, a class used by name
+        # brings its constructor along
+        lines = [line for name, sig in self.functions.items() if name in references and name not in defined
+                 for line in sig]
+        for name, (header, methods) in self.classes.items():
+            wanted = [line for method, sig in methods.items()
+                      if (method in references or (method == "__init__" and name in references))
+                      and f"{name}.{method}" not in defined
+                      for line in sig]
+            if wanted or (name in references and name not in defined):
+                lines += header + ["    " + line for line in wanted or ["..."]]
+        return lines
+
+    def text(self, defined, references, budget=None):
+        lines = self.lines(defined, references)
+        if not lines:
+            return ""
+        text = "\n".join([CONTEXT_HEADER] + ["# " + line for line in lines])
+        if budget is not None and len(text) > budget:
+            # a single unit bigger than the budget, keep as much context as still fits
+            text = text[:max(0, budget)].rsplit("\n", 1)[0]
+            if "\n" not in text:
+                return ""
+        return text
+
+
+def split_module(source, max_chars=12000):
+    """
+    Cut a module into chunks of roughly max_chars at class and function boundaries.
+
+    Every chunk carries the imports and, as context, the signatures of the definitions it
+    refers to that live in other chunks, so the model can still type calls across chunks.
+    The context counts against max_chars. A class too big for one chunk is split between
+    its methods, each piece keeping the class header with its decorators and annotated
+    fields, so only a single function or method longer than max_chars makes a longer chunk,
+    and it gets no more context. Returns [source] unchanged when it already fits, or when it
+    does not parse (e.g. python 2 code), since then it cannot be cut safely and goes out as
+    one prompt as before.
+    """
+    if len(source) <= max_chars:
+        return [source]
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return [source]
+    lines = source.splitlines()
+
+    imports, units, context = [], [], _Context()
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports.append("\n".join(lines[node.lineno - 1:node.end_lineno]))
+        else:
+            context.add(node)
+    shared = "\n".join(imports)
+    # a class piece leaves a quarter of the chunk for the imports and the context
+    piece_chars = max(1, (max_chars - len(shared)) * 3 // 4)
+
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            continue
+        text = "\n".join(lines[_first_line(node) - 1:node.end_lineno])
+        if isinstance(node, ast.ClassDef) and len(text) > piece_chars:
+            units += _class_parts(node, lines, piece_chars)
+        else:
+            units.append(_unit(text, node))
+
+    def size(chunk):
+        body = sum(len(text) + 2 for text, _, _ in chunk)
+        defined = set().union(*(d for _, d, _ in chunk))
+        references = set().union(*(r for _, _, r in chunk))
+        return len(shared) + body + len(context.text(defined, references)) + 4
+
+    chunks, current = [], []
+    for unit in units:
+        if current and size(current + [unit]) > max_chars:
+            chunks.append(current)
+            current = []
+        current.append(unit)
+    if current:
+        chunks.append(current)
+
+    result = []
+    for chunk in chunks:
+        code = "\n\n".join(text for text, _, _ in chunk)
+        defined = set().union(*(d for _, d, _ in chunk))
+        references = set().union(*(r for _, _, r in chunk))
+        budget = max_chars - len(shared) - len(code) - 4
+        result.append("\n\n".join(part for part in (shared, context.text(defined, references, budget), code) if part))
+    return result
+
+
+def extract_stub(response):
+    """Take the python code block out of a model answer, or the whole answer if there is none."""
+    match = re.search(r"```(?:python|py)?\s*\n(.*?)```", response, re.DOTALL)
+    return match.group(1) if match else response
+
+
+def extract_notes(response):
+    """The prose around the code block, i.e. the model's remarks on challenging types."""
+    return re.sub(r"```(?:python|py)?\s*\n.*?```", "", response, flags=re.DOTALL).strip()
+
+
+def _definition_key(node):
+    """What makes two stub statements the same definition, so a repeat of it is kept once."""
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        # overloads share a name, their decorators and signatures tell them apart
+        returns = ast.unparse(node.returns) if node.returns else None
+        return (type(node).__name__, node.name, tuple(ast.unparse(d) for d in node.decorator_list),
+                ast.unparse(node.args), returns)
+    if isinstance(node, ast.ClassDef):
+        return ("ClassDef", node.name)
+    return ast.unparse(node)
+
+
+def merge_stubs(fragments):
+    """
+    Merge stub fragments into one module: imports are deduplicated, classes split across
+    fragments are joined back together, and a definition repeated by several fragments is
+    kept once (overloads, differing in their signatures, are all kept). Raises SyntaxError
+    naming the fragment that does not parse.
+    """
+    imports, body = {}, []
+    classes, seen = {}, set()
+    for index, fragment in enumerate(fragments):
+        try:
+            tree = ast.parse(fragment)
+        except SyntaxError as e:
+            raise SyntaxError(f"Stub fragment {index} is not valid python: {e}")
+        for node in tree.body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                imports.setdefault(ast.unparse(node), node)
+            elif isinstance(node, ast.ClassDef):
+                if node.name not in classes:
+                    classes[node.name] = node
+                    body.append(node)
+                    continue
+                merged = classes[node.name]
+                members = {_definition_key(item) for item in merged.body}
+                for item in node.body:
+                    if isinstance(item, ast.Expr) or _definition_key(item) not in members:
+                        members.add(_definition_key(item))
+                        merged.body.append(item)
+            else:
+                key = _definition_key(node)
+                if key not in seen:
+                    seen.add(key)
+                    body.append(node)
+    for node in classes.values():
+        # drop the `...` placeholders left over once a class has real members
+        members = [item for item in node.body if not (isinstance(item, ast.Expr) and isinstance(item.value, ast.Constant))]
+        node.body = members or node.body[:1]
+    module = ast.Module(body=list(imports.values()) + body, type_ignores=[])
+    return ast.unparse(module) + "\n"
+
+
+def infer_chunked(source, template, complete, max_chars=12000, max_workers=8):
+    """
+    Send the chunks of source concurrently through complete(prompt) -> response and
+    merge the returned stubs, so a big file costs about as long as its slowest chunk.
+    Several files may be chunked at once, so complete should bound the requests in flight
+    for all of them, e.g. with a semaphore as llm_type_inference.py does.
+    """
+    chunks = split_module(source, max_chars)
+    prompts = [template.replace(PLACEHOLDER, chunk) for chunk in chunks]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(prompts))) as pool:
+        responses = list(pool.map(complete, prompts))
+    if len(responses) == 1:
+        return responses[0]
+    merged = merge_stubs([extract_stub(r) for r in responses])
+    # keep the remarks on challenging types as comments so the stub stays valid python
+    notes = [line for r in responses for line in extract_notes(r).splitlines()]
+    if notes:
+        merged += "\n" + "\n".join("# " + line if line else "#" for line in notes) + "\n"
+    return merged
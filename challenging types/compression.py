@@ -0,0 +1,155 @@
+import ast
+import sys
+from batching import estimate_tokens
+
+# statements a trimmed body always keeps, everything else has to earn its place
+_KEEP_ALWAYS = (ast.Return, ast.Raise, ast.Import, ast.ImportFrom, ast.FunctionDef,
+                ast.AsyncFunctionDef, ast.ClassDef, ast.AnnAssign)
+_COMPOUND = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try) + \
+            tuple(getattr(ast, name) for name in ("TryStar", "Match") if hasattr(ast, name))
+_TRY = (ast.Try,) + ((ast.TryStar,) if hasattr(ast, "TryStar") else ())
+
+
+def _ellipsis():
+    return ast.Expr(ast.Constant(...))
+
+
+def _strip_docstring(body):
+    if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+            and isinstance(body[0].value.value, str):
+        return body[1:] or [_ellipsis()]
+    return body
+
+
+def _is_self_target(target):
+    return isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) and target.value.id == "self"
+
+
+def _names(node):
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name)} if node is not None else set()
+
+
+def _keeps_type(stmt, needed):
+    """Whether a statement of a trimmed body carries type information."""
+    if isinstance(stmt, _KEEP_ALWAYS):
+        return True
+    if isinstance(stmt, ast.Expr):
+        return isinstance(stmt.value, (ast.Call, ast.Yield, ast.YieldFrom, ast.Await))
+    if isinstance(stmt, (ast.Assign, ast.AugAssign)):
+        targets = stmt.targets if isinstance(stmt, ast.Assign) else [stmt.target]
+        return any(_is_self_target(t) or _names(t) & needed for t in targets)
+    return False
+
+
+def _trim(body, needed):
+    kept = []
+    for stmt in body:
+        if isinstance(stmt, _COMPOUND):
+            useful = False
+            # the blocks of a statement: its own, its except handlers or its match cases
+            for block in [stmt] + list(getattr(stmt, "handlers", [])) + list(getattr(stmt, "cases", [])):
+                for field in ("body", "orelse", "finalbody"):
+                    statements = getattr(block, field, None)
+                    if statements:
+                        statements = _trim(statements, needed)
+                        useful = useful or bool(statements)
+                        setattr(block, field, statements or ([_ellipsis()] if field == "body" else []))
+            if not useful:
+                continue
+            if isinstance(stmt, _TRY) and not stmt.handlers and not stmt.finalbody:
+                # a try needs an except or a finally, without them its body stands alone
+                kept.extend(stmt.body)
+            else:
+                kept.append(stmt)
+        elif _keeps_type(stmt, needed):
+            kept.append(stmt)
+    return kept
+
+
+def _needed_names(function):
+    # names read by the statements a trimmed body keeps anyway (returns, calls, assignments
+    # to self), followed back through the assignments to them
+    needed = set()
+    for node in ast.walk(function):
+        if isinstance(node, (ast.Return, ast.Yield, ast.YieldFrom, ast.Raise, ast.Call)):
+            needed |= _names(node)
+        elif isinstance(node, ast.Assign) and any(_is_self_target(t) for t in node.targets):
+            needed |= _names(node.value)
+        elif isinstance(node, (ast.AugAssign, ast.AnnAssign)) and _is_self_target(node.target):
+            needed |= _names(node.value)
+    changed = True
+    while changed:
+        changed = False
+        for node in ast.walk(function):
+            if isinstance(node, (ast.Assign, ast.AugAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                if any(_names(t) & needed for t in targets):
+                    new = _names(node.value) - needed
+                    if new:
+                        needed |= new
+                        changed = True
+    return needed
+
+
+class _Compressor(ast.NodeTransformer):
+    def __init__(self, trim_bodies, long_body):
+        self.trim_bodies = trim_bodies
+        self.long_body = long_body
+
+    def visit_Module(self, node):
+        self.generic_visit(node)
+        node.body = _strip_docstring(node.body)
+        return node
+
+    def visit_ClassDef(self, node):
+        self.generic_visit(node)
+        node.body = _strip_docstring(node.body)
+        return node
+
+    def visit_FunctionDef(self, node):
+        self.generic_visit(node)
+        node.body = _strip_docstring(node.body)
+        size = sum(isinstance(n, ast.stmt) for n in ast.walk(node)) - 1
+        if self.trim_bodies and size > self.long_body:
+            node.body = _trim(node.body, _needed_names(node)) or [_ellipsis()]
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+
+def compress(source, trim_bodies=False, long_body=12):
+    """
+    Shrink a python source before it goes into a prompt. Comments and docstrings are
+    dropped, and with trim_bodies a function of more than long_body statements keeps only
+    what tells its types: returns and what flows into them, assignments to self, calls,
+    raises, imports and nested definitions. Signatures and decorators are untouched.
+
+    Returns (compressed source, tokens before, tokens after). A source that does not parse,
+    or that would not parse any more, is returned unchanged.
+    """
+    before = estimate_tokens(source)
+    try:
+        tree = _Compressor(trim_bodies, long_body).visit(ast.parse(source))
+        compressed = ast.unparse(ast.fix_missing_locations(tree))
+        ast.parse(compressed)
+    except (SyntaxError, ValueError, RecursionError):
+        return source, before, before
+    after = estimate_tokens(compressed)
+    if after >= before:
+        return source, before, before
+    return compressed, before, after
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python compression.py [--trim-bodies] <file.py>...")
+        sys.exit(1)
+    trim = "--trim-bodies" in sys.argv
+    total_before = total_after = 0
+    for path in [a for a in sys.argv[1:] if a != "--trim-bodies"]:
+        with open(path, "r", encoding="utf-8") as f:
+            _, before, after = compress(f.read(), trim_bodies=trim)
+        total_before += before
+        total_after += after
+        print(f"{path}: {before} -> {after} tokens, {before - after} saved")
+    print(f"Total: {total_before} -> {total_after} tokens, {total_before - total_after} saved")
@@ -0,0 +1,202 @@
+import ast
+import hashlib
+import os
+import random
+import sys
+from chunking import _signature
+
+try:
+    import numpy as np  # optional, computes all the MinHash permutations of a file at once
+except ImportError:
+    np = None
+
+# hashes are 32-bit and permuted modulo this prime, so a * h + b fits in 64 bits for numpy and python alike
+_PRIME = (1 << 32) - 5
+
+
+def _is_docstring(node):
+    return isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+
+
+def code_tokens(source):
+    """
+    The source as the code it means: node types, names and constants of its AST in source
+    order, docstrings left out, so comments, formatting and quoting no longer matter.
+    Source that does not parse falls back to its whitespace-separated words.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return source.split()
+    tokens, stack = [], [tree]
+    while stack:
+        node = stack.pop()
+        tokens.append(type(node).__name__)
+        children = []
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                if field == "body" and value and _is_docstring(value[0]):
+                    value = value[1:]
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        children.append(item)
+                    else:
+                        tokens.append(repr(item))
+            elif isinstance(value, ast.AST):
+                children.append(value)
+            elif value is not None:
+                tokens.append(repr(value))
+        # the stack is last in first out, push children reversed to visit them in order
+        stack.extend(reversed(children))
+    return tokens
+
+
+def exact_key(tokens):
+    return hashlib.sha256("\0".join(tokens).encode("utf-8")).hexdigest()
+
+
+def signatures(source):
+    """The top-level definitions and their signatures, which is all a stub describes."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+    return tuple(line for node in tree.body for line in _signature(node))
+
+
+def shingles(tokens, k=5):
+    """Hashes of every run of k consecutive tokens."""
+    # str hashes differ between processes but not within one, and clusters are built in one run
+    return list({hash(tuple(tokens[i:i + k])) & 0xFFFFFFFF for i in range(max(1, len(tokens) - k + 1))})
+
+
+class MinHasher:
+    """MinHash signatures over shingles, the fraction of equal slots estimates Jaccard similarity."""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.a = [rng.randrange(1, _PRIME) for _ in range(num_perm)]
+        self.b = [rng.randrange(0, _PRIME) for _ in range(num_perm)]
+
+    def signature(self, hashes):
+        if not hashes:
+            return (_PRIME,) * self.num_perm
+        if np is not None:
+            h = np.array(hashes, dtype=np.uint64)
+            a = np.array(self.a, dtype=np.uint64)[:, None]
+            b = np.array(self.b, dtype=np.uint64)[:, None]
+            return tuple(int(x) for x in ((a * h + b) % _PRIME).min(axis=1))
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in zip(self.a, self.b))
+
+
+def similarity(sig_a, sig_b):
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+
+class _Clusters:
+    # union-find over item names
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        self.parent.setdefault(x, x)
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, x, y):
+        x, y = self.find(x), self.find(y)
+        if x != y:
+            self.parent[max(x, y)] = min(x, y)
+
+
+def cluster(items, threshold=0.8, num_perm=64, bands=16):
+    """
+    Group (name, source) items into clusters of exact and near duplicates.
+
+    Exact duplicates share the hash of their code_tokens. The remaining files are compared
+    through MinHash signatures cut into bands, and only files that land in the
+    same bucket for some band are compared, so the cost grows with the corpus and not
+    with its square. A pair is joined when its estimated similarity reaches threshold.
+    Returns {representative: [names]}, the representative being the smallest name.
+    """
+    rows = num_perm // bands
+    hasher = MinHasher(num_perm)
+    clusters = _Clusters()
+    by_key, sigs, buckets = {}, {}, {}
+    by_text = {}
+    for name, source in items:
+        clusters.find(name)
+        # byte-identical copies, the usual vendored file, need no parsing at all
+        text_key = hashlib.sha256(source.encode("utf-8")).digest()
+        if text_key in by_text:
+            clusters.union(name, by_text[text_key])
+            continue
+        by_text[text_key] = name
+        tokens = code_tokens(source)
+        key = exact_key(tokens)
+        if key in by_key:
+            clusters.union(name, by_key[key])
+            continue
+        by_key[key] = name
+        sig = sigs[name] = hasher.signature(shingles(tokens))
+        for band in range(bands):
+            bucket = buckets.setdefault((band, sig[band * rows:(band + 1) * rows]), [])
+            joined = False
+            for other in bucket:
+                if clusters.find(other) == clusters.find(name):
+                    joined = True
+                elif similarity(sig, sigs[other]) >= threshold:
+                    clusters.union(name, other)
+                    joined = True
+            # a bucket keeps one file per cluster, so a thousand copies cost one comparison each
+            if not joined:
+                bucket.append(name)
+    groups = {}
+    for name in sorted(clusters.parent):
+        groups.setdefault(clusters.find(name), []).append(name)
+    return groups
+
+
+def plan(items, threshold=0.8):
+    """
+    Decide which items need a model call: returns (representatives, copies), where copies maps
+    a duplicate to the representative whose stub it can reuse. A near duplicate only reuses a
+    stub when its top-level signatures are the same, otherwise it stays a representative.
+    """
+    sources = dict(items)
+    representatives, copies = [], {}
+    for rep, names in cluster(items, threshold).items():
+        if len(names) == 1:
+            representatives.append((rep, sources[rep]))
+            continue
+        own = {rep: signatures(sources[rep])}
+        for name in names[1:]:
+            sig = own[rep] if sources[name] == sources[rep] else signatures(sources[name])
+            match = next((r for r, s in own.items() if s is not None and s == sig), None)
+            if match is None:
+                own[name] = sig
+            elif name != match:
+                copies[name] = match
+        representatives += [(name, sources[name]) for name in own]
+    return representatives, copies
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python dedup.py <root_directory>")
+        sys.exit(1)
+    items = []
+    for dirpath, _, filenames in os.walk(sys.argv[1]):
+        for file in filenames:
+            if file.endswith(".py"):
+                path = os.path.join(dirpath, file)
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    items.append((path, f.read()))
+    representatives, copies = plan(items)
+    for duplicate, rep in sorted(copies.items()):
+        print(f"{duplicate} -> {rep}")
+    print(f"{len(items)} files, {len(representatives)} need a model call, {len(copies)} reuse a stub")
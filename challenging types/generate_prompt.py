@@ -1,5 +1,6 @@
 import os
 import sys
+from compression import compress
 
 def find_python_files(root_dir):
     """Recursively yield all .py files under the given root directory."""
@@ -13,10 +14,18 @@ def load_template(template_path):
     with open(template_path, 'r') as f:
         return f.read()
 
-def generate_task_file(source_path, template, output_dir):
-    """Generate a single task file from a source Python file."""
+def generate_task_file(source_path, template, output_dir, compress_source=False, trim_bodies=False):
+    """
+    Generate a single task file from a source Python file. With compress_source, comments
+    and docstrings are stripped first (and long bodies trimmed with trim_bodies), see
+    compression.py. Returns the number of prompt tokens saved.
+    """
     with open(source_path, 'r') as f:
         source_code = f.read().rstrip()
+    saved = 0
+    if compress_source:
+        source_code, before, after = compress(source_code, trim_bodies=trim_bodies)
+        saved = before - after
 
     placeholder = "{Contents to be added from a python file}"
     if placeholder not in template:
@@ -40,14 +49,19 @@ def generate_task_file(source_path, template, output_dir):
             f.write(result)
     except Exception as e:
         print(e)
-    print(f"✅ Generated: {new_dir}")
+    print(f"✅ Generated: {new_dir}" + (f" ({saved} tokens saved)" if compress_source else ""))
+    return saved
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python generate_task_files.py <root_directory>")
+    flags = {arg for arg in sys.argv[1:] if arg.startswith("--")}
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if len(args) != 1 or not flags <= {"--compress", "--trim-bodies"}:
+        print("Usage: python generate_task_files.py [--compress [--trim-bodies]] <root_directory>")
         sys.exit(1)
 
-    root_dir = sys.argv[1]
+    root_dir = args[0]
+    compress_source = "--compress" in flags or "--trim-bodies" in flags
+    trim_bodies = "--trim-bodies" in flags
     template_path = "task_template.txt"
     output_dir = "output"
 
@@ -64,10 +78,13 @@ def main():
         print("No Python files found.")
         sys.exit(0)
     number_file = 0
+    saved = 0
     for py_file in py_files:
-        generate_task_file(py_file, template, output_dir)
+        saved += generate_task_file(py_file, template, output_dir, compress_source, trim_bodies)
         number_file = number_file + 1
     print("Total number of files: ", number_file)
+    if compress_source:
+        print("Total tokens saved: ", saved)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import tempfile
+
+
+def prompt_key(model, prompt):
+    """Content hash identifying one model response: same model and prompt, same key."""
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def atomic_write(path, text):
+    """Write text to path so that readers see either the old or the complete new file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ResponseCache:
+    """Durable cache of model responses keyed by prompt_key(model, prompt)."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _path(self, key):
+        # fan out over 256 subdirectories so no single directory gets huge
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, model, prompt):
+        try:
+            with open(self._path(prompt_key(model, prompt)), "r", encoding="utf-8") as f:
+                return json.load(f)["response"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, model, prompt, response):
+        key = prompt_key(model, prompt)
+        atomic_write(self._path(key), json.dumps({"model": model, "response": response}))
+        return key
+
+
+class Checkpoint:
+    """
+    Manifest of finished and failed files for a run, so that a rerun skips what is done.
+
+    The manifest is an append-only JSON lines log, one record per finished or failed
+    file, so recording a file costs one small write however large the corpus is. A line
+    cut short by a crash is ignored on the next load.
+    """
+
+    def __init__(self, manifest_path):
+        self.manifest_path = manifest_path
+        self.entries = {}
+        self._torn_line = False
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                line = ""
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries[record["path"]] = record
+                # start the next record on a fresh line if the last one was cut short
+                self._torn_line = bool(line) and not line.endswith("\n")
+
+    def is_done(self, path, key):
+        record = self.entries.get(path)
+        return record is not None and record["status"] == "done" and record["key"] == key
+
+    def failed(self):
+        return [path for path, record in self.entries.items() if record["status"] == "failed"]
+
+    def _append(self, record):
+        self.entries[record["path"]] = record
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.manifest_path, "a", encoding="utf-8") as f:
+            if self._torn_line:
+                f.write("\n")
+                self._torn_line = False
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def mark_done(self, path, key):
+        self._append({"path": path, "key": key, "status": "done"})
+
+    def mark_failed(self, path, key, error):
+        self._append({"path": path, "key": key, "status": "failed", "error": str(error)})
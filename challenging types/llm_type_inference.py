@@ -12,61 +12,109 @@ Original file is located at
 
 # from openai import OpenAI
 import json
+import threading
 import time
 import os
-from pathlib import Path
+import zipfile
 
 from mistralai import Mistral
+from llm_cache import ResponseCache, Checkpoint
+from chunking import PLACEHOLDER, infer_chunked
+from batching import infer_batched
+from dedup import plan
+from pipeline import iter_sources, run_pipeline
+from telemetry import Telemetry
+from compression import compress
 api_key = ""
 client = Mistral(api_key=api_key)
 model = "mistral-large-latest"
 
-import zipfile
+# responses are cached by a hash of model + prompt, so a rerun only pays for the files that
+# failed. The checkpoint records every file as it is written or fails, a rerun copies the
+# stubs of the files that are done from the previous output instead of asking again
+cache = ResponseCache("sample_data/llm_cache")
+checkpoint = Checkpoint("sample_data/llm_checkpoint.jsonl")
+
+# the archive holds the .txt prompts written by generate_prompt.py, set python_sources to
+# send its .py files instead
+python_sources = False
+# sources longer than this are split at class/function boundaries and sent as parallel requests
+template = open("task_template.txt", encoding="utf-8").read()
+max_chunk_chars = 12000
+# sources shorter than this are packed several to a request, up to the token budget
+small_file_chars = 4000
+batch_token_budget = 6000
+# a failed request is retried with exponential backoff, every attempt shows up in the metrics
+max_attempts = 3
+# requests in flight at once across all files and their chunks, the chunks of a large file
+# wait for a slot like everything else instead of adding their own requests on top
+max_requests = 8
+request_slots = threading.BoundedSemaphore(max_requests)
+# comments and docstrings are stripped before templating, long bodies are trimmed too when
+# trim_long_bodies is set, the tokens saved are counted in the metrics
+compress_prompts = True
+trim_long_bodies = False
+telemetry = Telemetry()
+
+def complete(prompt):
+    result = cache.get(model, prompt)
+    if result is not None:
+      telemetry.cache_hit()
+      return result
+    for attempt in range(max_attempts):
+      try:
+        with request_slots, telemetry.request(prompt, retry=attempt > 0) as request:
+          response = client.chat.complete(
+              model= model,
+              messages = [
+                  {
+                      "role": "user",
+                      "content": prompt,
+                  },
+              ]
+          )
+          result = response.choices[0].message.content
+          usage = getattr(response, "usage", None)
+          request.response(result, getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None))
+        break
+      except Exception:
+        if attempt == max_attempts - 1:
+          raise
+        time.sleep(2 ** attempt)
+    cache.put(model, prompt, result)
+    return result
+
+def process(batch):
+    # one large source, chunked when it is very large, or several small ones in one request
+    if compress_prompts:
+      compressed = []
+      for name, source in batch:
+        source, before, after = compress(source, trim_bodies=trim_long_bodies)
+        telemetry.compressed(before, after)
+        compressed.append((name, source))
+      batch = compressed
+    if len(batch) == 1:
+      name, source = batch[0]
+      if len(source) > max_chunk_chars:
+        return {name: infer_chunked(source, template, complete, max_chunk_chars)}
+      return {name: complete(template.replace(PLACEHOLDER, source))}
+    return infer_batched(batch, template, complete, batch_token_budget)
+
+# sources are read straight from the input archive and the stubs written straight into the
+# output archive, nothing is extracted. Near duplicates need the whole corpus, so they are
+# found in a first pass over the archive, exact duplicates are caught while streaming.
 zip_path = "swe.zip"
-extract_to = "sample_data/extracted"
-with zipfile.ZipFile(zip_path, "r") as zip_ref:
-    zip_ref.extractall(extract_to)
-
-def infer_type(prompt,  pathname, filename):
-
-    try:
-      response = client.chat.complete(
-          model= model,
-          messages = [
-              {
-                  "role": "user",
-                  "content": prompt,
-              },
-          ]
-      )
-      result = response.choices[0].message.content
-      new_name = filename.replace(".txt",".pyi")
-      new_file_path = os.path.join(pathname, new_name)
-      print("new file path: ", new_file_path)
-      with open(new_file_path, "w", encoding="utf-8") as f:
-        f.write(result)
-
-    except Exception as e:
-      print("Error: ",e)
-      return None
-
-def read_all_files_as_string(directory_path: str) -> str:
-      root_dir = Path("sample_data/extracted/swe")  # replace with your target directory
-      all_txt_content = {}
-
-      for txt_file in root_dir.rglob("*.txt"):
-          with txt_file.open("r", encoding="utf-8") as f:
-              all_txt_content[str(txt_file)] = f.read()
-
-      for filename, content in all_txt_content.items():
-          filename2 = os.path.basename(filename)
-          dirpath = os.path.dirname(filename)
-          infer_type(content,dirpath, filename2)
-
-
-
-directory = "sample_data/prompts"  # Replace with your directory
-all_content = read_all_files_as_string(directory)
-
-!zip -r swe2.zip sample_data/extracted/swe
-
+output_zip_path = "swe2.zip"
+with zipfile.ZipFile(zip_path) as zip_ref:
+    _, copies = plan(list(iter_sources(zip_ref, template, python_sources)))
+print(f"{len(copies)} duplicate files reuse the stub of another file")
+
+telemetry.start_progress()
+summary = run_pipeline(zip_path, output_zip_path, process, template=template, workers=max_requests,
+                       small_chars=small_file_chars, batch_chars=4 * batch_token_budget, copies=copies,
+                       telemetry=telemetry, python_sources=python_sources, checkpoint=checkpoint)
+telemetry.stop_progress()
+telemetry.write_prometheus("sample_data/llm_metrics.prom")
+telemetry.write_json("sample_data/llm_metrics.json")
+print(f"Wrote {summary['written']} stubs to {output_zip_path}")
+print("Failed files: ", sorted(checkpoint.failed()))
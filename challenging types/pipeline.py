@@ -0,0 +1,208 @@
+import os
+import queue
+import threading
+import time
+import zipfile
+from chunking import split_prompt
+from dedup import code_tokens, exact_key
+
+_DONE = object()
+
+
+def iter_sources(zip_file, template=None, python_sources=False):
+    """
+    (member name, python source) for the .txt members of an open ZipFile that hold a prompt
+    generated from template, read one member at a time. With python_sources the .py members
+    are taken instead. Never both: generate_prompt.py writes m.txt next to an already typed
+    m.py, and the two would end up as the same m.pyi.
+    """
+    if template is None and not python_sources:
+        raise Exception("The template is needed to read the .txt prompts")
+    suffix = ".py" if python_sources else ".txt"
+    for info in zip_file.infolist():
+        if info.is_dir() or not info.filename.endswith(suffix):
+            continue
+        source = zip_file.read(info).decode("utf-8", errors="replace")
+        if not python_sources:
+            source = split_prompt(source, template)
+        if source is not None:
+            yield info.filename, source
+
+
+def stub_name(name):
+    return name.rsplit(".", 1)[0] + ".pyi"
+
+
+def run_pipeline(input_zip, output_zip, process, template=None, workers=8, queue_size=32,
+                 small_chars=4000, batch_chars=24000, copies=None, telemetry=None, python_sources=False,
+                 checkpoint=None):
+    """
+    Stream the sources of input_zip (see iter_sources) through process and write the stubs
+    into output_zip, without extracting anything to disk.
+
+    A reader thread feeds a bounded queue, so it stays at most queue_size files ahead of the
+    workers, and the workers block on the bounded result queue when the writer falls behind.
+    A worker calls process(batch) -> {name: stub} for a batch of (name, source): a large
+    source goes alone, small ones (under small_chars) are gathered from the queue up to
+    batch_chars. An exception in place of a stub fails that file with it, as does one raised
+    by process for the whole batch. Only the calling thread touches output_zip, as ZipFile writes are not
+    thread safe.
+
+    A source whose code is identical to one already read is not sent again and gets the same
+    stub, as does every name in copies, a {duplicate: representative} map from dedup.plan.
+    A member whose stub name is already taken by another member fails instead of being sent.
+    A Telemetry (see telemetry.py) gets every queued and finished file and the queue waits.
+
+    A Checkpoint (see llm_cache.py) records every file as soon as its stub is written or it
+    fails, keyed by its code, so a crash loses nothing. On a rerun, a file that is done with
+    the same code is not sent again, its stub is copied over from the previous output_zip,
+    which is replaced once the new one is complete. The stubs are written to output_zip +
+    ".tmp" until then, so output_zip is always a complete archive or absent; one that cannot
+    be read is taken as absent and its done files are sent again.
+    Returns {"written": count, "failed": {name: error}}.
+    """
+    copies = copies or {}
+    work = queue.Queue(maxsize=queue_size)
+    results = queue.Queue(maxsize=queue_size)
+    lock = threading.Lock()
+    followers = {}  # representative -> names waiting for its stub
+    stubs = {}      # representative -> stub, once written
+    keys = {}       # name -> key of its code, for the checkpoint
+    previous = None
+    if checkpoint is not None and os.path.exists(output_zip):
+        try:
+            previous = zipfile.ZipFile(output_zip)
+        except (OSError, zipfile.BadZipFile):
+            # not a complete archive, the files it should hold are sent again
+            previous = None
+    # written next to output_zip and moved in place once closed, so a run that dies midway
+    # never leaves a torn archive where the next run looks for the previous stubs
+    target = output_zip + ".tmp"
+    previous_stubs = set(previous.namelist()) if previous is not None else set()
+    for duplicate, representative in copies.items():
+        followers.setdefault(representative, []).append(duplicate)
+
+    def follow(name, representative):
+        # the stub may already be written, then the follower goes straight to the writer
+        with lock:
+            if representative not in stubs:
+                followers.setdefault(representative, []).append(name)
+                return
+            stub = stubs[representative]
+        results.put((name, stub, None if stub is not None else Exception(f"no stub for its duplicate {representative}")))
+
+    def read():
+        seen = {}
+        stub_names = {}  # stub name -> the member it is written for
+        try:
+            with zipfile.ZipFile(input_zip) as zip_file:
+                for name, source in iter_sources(zip_file, template, python_sources):
+                    if telemetry is not None:
+                        telemetry.file_queued()
+                    if stub_name(name) in stub_names:
+                        taken_by = stub_names[stub_name(name)]
+                        results.put((name, None, Exception(f"{stub_name(name)} is already the stub of {taken_by}")))
+                        continue
+                    stub_names[stub_name(name)] = name
+                    key = keys[name] = exact_key(code_tokens(source))
+                    if name in copies:
+                        continue
+                    if checkpoint is not None and checkpoint.is_done(name, key) and stub_name(name) in previous_stubs:
+                        seen.setdefault(key, name)
+                        results.put((name, previous.read(stub_name(name)).decode("utf-8"), None))
+                        continue
+                    if key in seen:
+                        follow(name, seen[key])
+                        continue
+                    seen[key] = name
+                    work.put((name, source, time.monotonic()))
+        except Exception as e:
+            results.put((input_zip, None, e))
+        finally:
+            for _ in range(workers):
+                work.put(_DONE)
+
+    def work_loop():
+        carry = None
+        while True:
+            item = carry if carry is not None else work.get()
+            carry = None
+            if item is _DONE:
+                break
+            batch, size = [item], len(item[1])
+            while size < small_chars:
+                try:
+                    item = work.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _DONE or len(item[1]) >= small_chars or size + len(item[1]) > batch_chars:
+                    carry = item
+                    break
+                batch.append(item)
+                size += len(item[1])
+            if telemetry is not None:
+                now = time.monotonic()
+                for _, _, queued in batch:
+                    telemetry.file_waited(now - queued)
+            batch = [(name, source) for name, source, _ in batch]
+            try:
+                answers = process(batch)
+            except Exception as e:
+                answers, error = {}, e
+            else:
+                error = Exception("no answer for this file")
+            for name, _ in batch:
+                answer = answers.get(name)
+                if isinstance(answer, Exception):
+                    results.put((name, None, answer))
+                else:
+                    results.put((name, answer, None if name in answers else error))
+            if carry is _DONE:
+                break
+        results.put(_DONE)
+
+    threads = [threading.Thread(target=read, daemon=True)]
+    threads += [threading.Thread(target=work_loop, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    written, failed, running = 0, {}, workers
+
+    def finish(out, name, stub, error):
+        nonlocal written
+        if stub is None:
+            failed[name] = str(error)
+        else:
+            out.writestr(stub_name(name), stub)
+            written += 1
+        if telemetry is not None:
+            telemetry.file_finished(stub is not None)
+        if checkpoint is not None:
+            key = keys.get(name)
+            if stub is None:
+                checkpoint.mark_failed(name, key, error)
+            elif not checkpoint.is_done(name, key):
+                checkpoint.mark_done(name, key)
+
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as out:
+        while running:
+            result = results.get()
+            if result is _DONE:
+                running -= 1
+                continue
+            name, stub, error = result
+            finish(out, name, stub, error)
+            with lock:
+                stubs[name] = stub
+                waiting = followers.pop(name, [])
+            for duplicate in waiting:
+                finish(out, duplicate, stub, f"no stub for its duplicate {name}")
+        for thread in threads:
+            thread.join()
+        for representative, waiting in followers.items():
+            for duplicate in waiting:
+                finish(out, duplicate, None, f"{representative} is not in {input_zip}")
+    if previous is not None:
+        previous.close()
+    os.replace(target, output_zip)
+    return {"written": written, "failed": failed}
@@ -0,0 +1,239 @@
+import json
+import sys
+import threading
+import time
+from batching import estimate_tokens
+from llm_cache import atomic_write
+
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+WAIT_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 15, 60, 300)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+class Histogram:
+    """Counts per upper bound, like a Prometheus histogram, plus the sum of what was observed."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate by linear interpolation inside the bucket holding the q-th observation."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen, lower = 0, 0.0
+        for i, n in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else lower
+            if n and seen + n >= rank:
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            lower = upper
+        return lower
+
+    def prometheus(self, name):
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum {self.sum:.6f}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+
+class _Request:
+    def __init__(self, telemetry, prompt, retry):
+        self.telemetry = telemetry
+        self.prompt = prompt
+        self.retry = retry
+        self.result = None
+        self.usage = None
+
+    def response(self, text, prompt_tokens=None, response_tokens=None):
+        """Record the answer, with the provider's token counts when it reports them."""
+        self.result = text
+        self.usage = (prompt_tokens, response_tokens)
+
+    def __enter__(self):
+        with self.telemetry.lock:
+            self.telemetry.in_flight += 1
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, kind, error, traceback):
+        self.telemetry._finish(self, time.monotonic() - self.start, error)
+        return False
+
+
+class Telemetry:
+    """
+    Metrics of a stub generation run: every model request with its latency, prompt and
+    response size and outcome, retries and cache hits, how long files wait in the pipeline
+    queue, and how many files are done or failed.
+
+        with telemetry.request(prompt, retry=attempt > 0) as request:
+            answer = call_the_model(prompt)
+            request.response(answer, usage.prompt_tokens, usage.completion_tokens)
+
+    Everything is guarded by one lock, so worker threads can record concurrently. The
+    numbers come out as a Prometheus text file, a JSON summary, or a live progress line.
+    Token counts are estimated from the text when the provider does not report them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queue_wait = Histogram(WAIT_BUCKETS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.response_tokens = Histogram(TOKEN_BUCKETS)
+        self.requests = {"ok": 0, "error": 0}
+        self.retries = 0
+        self.cache_hits = 0
+        self.tokens_saved = 0
+        self.in_flight = 0
+        self.files = {"queued": 0, "done": 0, "failed": 0}
+        self._progress = None
+
+    def request(self, prompt, retry=False):
+        return _Request(self, prompt, retry)
+
+    def _finish(self, request, elapsed, error):
+        prompt_tokens, response_tokens = request.usage or (None, None)
+        if prompt_tokens is None:
+            prompt_tokens = estimate_tokens(request.prompt)
+        if response_tokens is None and request.result is not None:
+            response_tokens = estimate_tokens(request.result)
+        with self.lock:
+            self.in_flight -= 1
+            self.latency.observe(elapsed)
+            self.requests["error" if error is not None else "ok"] += 1
+            if request.retry:
+                self.retries += 1
+            self.prompt_tokens.observe(prompt_tokens)
+            if response_tokens is not None:
+                self.response_tokens.observe(response_tokens)
+
+    def cache_hit(self):
+        with self.lock:
+            self.cache_hits += 1
+
+    def compressed(self, before, after):
+        # prompt tokens saved by compression.py before templating
+        with self.lock:
+            self.tokens_saved += before - after
+
+    def file_queued(self):
+        with self.lock:
+            self.files["queued"] += 1
+
+    def file_waited(self, seconds):
+        with self.lock:
+            self.queue_wait.observe(seconds)
+
+    def file_finished(self, ok):
+        with self.lock:
+            self.files["done" if ok else "failed"] += 1
+
+    def summary(self):
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            finished = self.files["done"] + self.files["failed"]
+            requests = self.requests["ok"] + self.requests["error"]
+            return {
+                "elapsed_seconds": round(elapsed, 3),
+                "files": dict(self.files),
+                "files_per_minute": round(60 * finished / elapsed, 2) if elapsed else 0.0,
+                "requests": dict(self.requests),
+                "failure_rate": round(self.requests["error"] / requests, 4) if requests else 0.0,
+                "retries": self.retries,
+                "cache_hits": self.cache_hits,
+                "in_flight": self.in_flight,
+                "prompt_tokens": int(self.prompt_tokens.sum),
+                "response_tokens": int(self.response_tokens.sum),
+                "tokens_saved": self.tokens_saved,
+                "latency_seconds": _quantiles(self.latency),
+                "queue_wait_seconds": _quantiles(self.queue_wait),
+            }
+
+    def prometheus(self):
+        with self.lock:
+            lines = []
+
+            def metric(name, kind, text, samples):
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(samples)
+
+            metric("llm_request_duration_seconds", "histogram", "Model request latency.",
+                   self.latency.prometheus("llm_request_duration_seconds"))
+            metric("llm_queue_wait_seconds", "histogram", "Time a file waited for a worker.",
+                   self.queue_wait.prometheus("llm_queue_wait_seconds"))
+            metric("llm_prompt_tokens", "histogram", "Prompt size per request.",
+                   self.prompt_tokens.prometheus("llm_prompt_tokens"))
+            metric("llm_response_tokens", "histogram", "Response size per request.",
+                   self.response_tokens.prometheus("llm_response_tokens"))
+            metric("llm_requests_total", "counter", "Model requests by outcome.",
+                   [f'llm_requests_total{{outcome="{k}"}} {v}' for k, v in self.requests.items()])
+            metric("llm_retries_total", "counter", "Requests that were retries.", [f"llm_retries_total {self.retries}"])
+            metric("llm_cache_hits_total", "counter", "Prompts answered from the cache.", [f"llm_cache_hits_total {self.cache_hits}"])
+            metric("llm_prompt_tokens_saved_total", "counter", "Tokens removed by prompt compression.",
+                   [f"llm_prompt_tokens_saved_total {self.tokens_saved}"])
+            metric("llm_files_total", "counter", "Files by state.",
+                   [f'llm_files_total{{state="{k}"}} {v}' for k, v in self.files.items()])
+            metric("llm_requests_in_flight", "gauge", "Requests waiting for the model.", [f"llm_requests_in_flight {self.in_flight}"])
+            return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # e.g. into the textfile collector directory of node_exporter
+        atomic_write(path, self.prometheus())
+
+    def write_json(self, path):
+        atomic_write(path, json.dumps(self.summary(), indent=2))
+
+    def progress_line(self):
+        s = self.summary()
+        latency = s["latency_seconds"]
+        timing = f", p50 {latency['p50']:.1f}s p90 {latency['p90']:.1f}s" if latency else ""
+        return (f"{s['files']['done']}/{s['files']['queued']} files, {s['files']['failed']} failed, "
+                f"{s['files_per_minute']:.1f} files/min, {sum(s['requests'].values())} requests "
+                f"({s['requests']['error']} errors, {s['retries']} retries, {s['cache_hits']} cached), "
+                f"{s['in_flight']} in flight{timing}")
+
+    def start_progress(self, interval=1.0, stream=sys.stderr):
+        """Redraw the progress line every interval seconds until stop_progress()."""
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                stream.write("\r" + self.progress_line() + "\033[K")
+                stream.flush()
+            stream.write("\r" + self.progress_line() + "\033[K\n")
+            stream.flush()
+
+        thread = threading.Thread(target=run, daemon=True)
+        self._progress = (stop, thread)
+        thread.start()
+
+    def stop_progress(self):
+        if self._progress is not None:
+            stop, thread = self._progress
+            stop.set()
+            thread.join()
+            self._progress = None
+
+
+def _quantiles(histogram):
+    if not histogram.count:
+        return {}
+    return {name: round(histogram.quantile(q), 3) for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))}
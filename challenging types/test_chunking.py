@@ -0,0 +1,39 @@
+import ast
+from chunking import split_module
+
+# run with python -m pytest from this directory
+
+
+def decorated_module(methods=40):
+    lines = ["from dataclasses import dataclass", "", "", "@dataclass(frozen=True)", "class Point:",
+             "    x: int", "    y: int", ""]
+    for i in range(methods):
+        lines += ["    @staticmethod", f"    def scaled{i}(p, factor):", f"        return Point(p.x * factor + {i}, p.y * factor)", ""]
+    lines += ["", "@lru_cache", "def origin():", "    return Point(0, 0)", "", "",
+              "def use():", "    return origin()"]
+    return "\n".join(lines) + "\n"
+
+
+def test_decorated_class_pieces_keep_their_decorators():
+    chunks = split_module(decorated_module(), max_chars=1500)
+    pieces = [chunk for chunk in chunks if "class Point:" in chunk]
+    assert len(pieces) > 1
+    for piece in pieces:
+        # the fields make up the constructor of the dataclass
+        assert "@dataclass(frozen=True)\nclass Point:\n    x: int\n    y: int\n" in piece
+    for chunk in chunks:
+        ast.parse(chunk)
+        lines = chunk.splitlines()
+        for i, line in enumerate(lines):
+            if line.startswith("class Point"):
+                assert lines[i - 1] == "@dataclass(frozen=True)"
+            if line.startswith("    def scaled"):
+                assert lines[i - 1] == "    @staticmethod"
+
+
+def test_context_keeps_decorators():
+    body = "".join(f"    v{i} = {i}\n" for i in range(60))
+    source = f"@lru_cache\ndef origin():\n{body}    return 0\n\n\ndef use():\n    return origin()\n"
+    chunks = split_module(source, max_chars=600)
+    assert len(chunks) == 2
+    assert "# @lru_cache\n# def origin(): ...\n\ndef use():" in chunks[1]
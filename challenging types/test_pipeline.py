@@ -0,0 +1,121 @@
+import os
+import subprocess
+import sys
+import zipfile
+from batching import infer_batched
+from llm_cache import Checkpoint
+from pipeline import run_pipeline
+
+# run with python -m pytest from this directory
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FILES = 12
+
+
+def make_input(path, files=FILES):
+    with zipfile.ZipFile(path, "w") as zip_file:
+        for i in range(files):
+            zip_file.writestr(f"m{i}.py", f"def f{i}(x):\n    return x + {i}\n")
+
+
+def stubs(sent):
+    def process(batch):
+        sent.extend(name for name, _ in batch)
+        return {name: f"# stub of {name}\n" for name, _ in batch}
+    return process
+
+
+def run(tmp_path, sent):
+    return run_pipeline(str(tmp_path / "in.zip"), str(tmp_path / "out.zip"), stubs(sent), workers=2,
+                        small_chars=0, python_sources=True, checkpoint=Checkpoint(str(tmp_path / "checkpoint.jsonl")))
+
+
+# a run in its own process that dies without any cleanup once `after` files were sent
+KILLED_RUN = """
+import os, sys
+from llm_cache import Checkpoint
+from pipeline import run_pipeline
+tmp, after = sys.argv[1], int(sys.argv[2])
+sent = []
+def process(batch):
+    if len(sent) >= after:
+        os._exit(1)
+    sent.extend(name for name, _ in batch)
+    return {name: "# stub of " + name + "\\n" for name, _ in batch}
+run_pipeline(os.path.join(tmp, "in.zip"), os.path.join(tmp, "out.zip"), process, workers=1,
+             small_chars=0, python_sources=True, checkpoint=Checkpoint(os.path.join(tmp, "checkpoint.jsonl")))
+"""
+
+
+def assert_complete(tmp_path):
+    with zipfile.ZipFile(tmp_path / "out.zip") as out:
+        assert sorted(out.namelist()) == sorted(f"m{i}.pyi" for i in range(FILES))
+        assert out.read("m3.pyi") == b"# stub of m3.py\n"
+    assert not os.path.exists(tmp_path / "out.zip.tmp")
+
+
+def test_rerun_after_kill(tmp_path):
+    make_input(tmp_path / "in.zip")
+    killed = subprocess.run([sys.executable, "-c", KILLED_RUN, str(tmp_path), "5"], cwd=HERE)
+    assert killed.returncode == 1
+    # the torn archive is the temporary one, there is no output yet
+    assert not os.path.exists(tmp_path / "out.zip")
+    assert len(Checkpoint(str(tmp_path / "checkpoint.jsonl")).entries) <= 5
+
+    sent = []
+    summary = run(tmp_path, sent)
+    assert summary == {"written": FILES, "failed": {}}
+    assert sorted(sent) == sorted(f"m{i}.py" for i in range(FILES))
+    assert_complete(tmp_path)
+
+
+def test_rerun_skips_done_files(tmp_path):
+    make_input(tmp_path / "in.zip")
+    run(tmp_path, [])
+    with zipfile.ZipFile(tmp_path / "in.zip", "a") as zip_file:
+        zip_file.writestr("new.py", "def g(): return 1\n")
+    sent = []
+    summary = run(tmp_path, sent)
+    assert sent == ["new.py"]
+    assert summary["written"] == FILES + 1
+
+
+def test_unreadable_previous_output(tmp_path):
+    make_input(tmp_path / "in.zip")
+    run(tmp_path, [])
+    # cut short like an archive whose writer died before the central directory
+    with open(tmp_path / "out.zip", "r+b") as f:
+        f.truncate(os.path.getsize(tmp_path / "out.zip") // 2)
+    sent = []
+    summary = run(tmp_path, sent)
+    assert summary == {"written": FILES, "failed": {}}
+    assert len(sent) == FILES
+    assert_complete(tmp_path)
+
+
+def test_failed_file_is_recorded_and_retried(tmp_path):
+    make_input(tmp_path / "in.zip")
+    template = "Type this: {Contents to be added from a python file}"
+    down = [True]
+
+    def complete(prompt):
+        if "FILE:" in prompt:
+            raise Exception("batch request failed")
+        if "f3(" in prompt and down[0]:
+            raise Exception("model unavailable")
+        return "```python\ndef f(x): ...\n```"
+
+    def process(batch):
+        return infer_batched(batch, template, complete)
+
+    def rerun():
+        return run_pipeline(str(tmp_path / "in.zip"), str(tmp_path / "out.zip"), process, workers=1,
+                            python_sources=True, checkpoint=Checkpoint(str(tmp_path / "checkpoint.jsonl")))
+
+    summary = rerun()
+    assert summary["failed"] == {"m3.py": "model unavailable"}
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.jsonl"))
+    assert checkpoint.failed() == ["m3.py"]
+    assert checkpoint.entries["m3.py"]["error"] == "model unavailable"
+    down[0] = False
+    assert rerun() == {"written": FILES, "failed": {}}
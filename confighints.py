@@ -0,0 +1,382 @@
+import os
+import re
+import sys
+import warnings
+from typespy import *
+
+try:
+    import ijson  # optional, its C backend parses JSON much faster than the fallback below
+except ImportError:
+    ijson = None
+
+'''
+Dict hints from real config files: load_hint("config.json") streams the file once and
+returns the per-key types Inferencer(hint=...) expects, like {"key1": TStr(), "key2": TInt()}.
+
+The file is read in chunks and turned into events (start/end of objects and arrays, keys,
+scalars), and only the types are kept: nested objects become TDict with their own hint,
+arrays become TList of the union of their elements. Repeated shapes, e.g. a list of a
+million records, are merged as they stream by, so memory follows the shape of the config
+and not its size. YAML needs PyYAML, whose event parser is streaming as well.
+
+JSON is parsed by ijson when it is installed, otherwise by a small chunked tokenizer that
+never holds more than a chunk plus the current key, however long a string value is. The
+fallback does a few MB/s. That is fine for configs, but a multi-gigabyte dump needs ijson
+(pip install ijson), and load_hint warns when it has to read one without it.
+'''
+
+CHUNK_SIZE = 1 << 16
+LARGE_JSON = 256 << 20  # bytes, beyond this the fallback tokenizer takes minutes
+
+# commas and colons carry no type information and are skipped along with the whitespace.
+# A string without escapes is matched whole, any other only has its opening quote matched
+# here and is scanned by _string_end, which can resume in the next chunk
+_JSON_TOKEN = re.compile(r'''
+    [\s,:]*(?:
+        ("[^"\\]*")
+      | ([{}\[\]"])
+      | (-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+      | (true|false|null)
+    )''', re.VERBOSE)
+_SEPARATORS = re.compile(r"[\s,:]*")
+_JSON_ESCAPES = re.compile(r'\\(u[0-9a-fA-F]{4}|.)')
+_ESCAPED = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+
+
+# scalar types are shared, so merging an already seen shape is mostly identity checks
+_STR, _INT, _BOOL, _NONE = TStr(), TInt(), TBool(), TNone()
+MERGE = object()  # the pending key of a YAML merge key (<<: *base), see HintBuilder.merge
+
+
+def merge_types(a: Type, b: Type) -> Type:
+    # returns a itself when b adds nothing new, so repeated records allocate nothing
+    if a is b or b is None:
+        return a
+    if isinstance(a, TUnion) and any(o is b for o in a.options):
+        return a
+    # a TVar stands for "nothing seen yet", e.g. the elements of an empty list
+    if a is None or isinstance(a, TVar):
+        return b
+    if isinstance(b, TVar):
+        return a
+    if type(a) == type(b) and not isinstance(a, (TDict, TList, TUnion)):
+        return a
+    if isinstance(a, TDict) and isinstance(b, TDict):
+        a_hint = a.hint or {}
+        hint = None
+        for key, t in (b.hint or {}).items():
+            old = a_hint.get(key)
+            merged = merge_types(old, t)
+            if merged is not old:
+                if hint is None:
+                    hint = dict(a_hint)
+                hint[key] = merged
+        if hint is None and b.hint:
+            # every value of b is already in a hint of a, and so in a's value type
+            return a
+        value_type = merge_types(a.value_type, b.value_type)
+        if hint is None and value_type is a.value_type:
+            return a
+        return TDict(_STR, value_type, a_hint if hint is None else hint)
+    if isinstance(a, TList) and isinstance(b, TList):
+        elem_type = merge_types(a.elem_type, b.elem_type)
+        return a if elem_type is a.elem_type else TList(elem_type)
+    options = list(a.options) if isinstance(a, TUnion) else [a]
+    changed = False
+    for t in (b.options if isinstance(b, TUnion) else [b]):
+        for i, o in enumerate(options):
+            if type(o) == type(t):
+                merged = merge_types(o, t)
+                if merged is not o:
+                    options[i] = merged
+                    changed = True
+                break
+        else:
+            options.append(t)
+            changed = True
+    if not changed:
+        return a
+    return options[0] if len(options) == 1 else TUnion(options)
+
+
+class HintBuilder:
+    # frames are [kind, element type of an array, hint of an object, pending key, keys of the
+    # object that only come from merged mappings]. The value type of an object is only worked
+    # out at its end, from the hint
+    def __init__(self):
+        self.stack = []
+        self.result = None
+        self.last = None
+
+    def _value(self, t):
+        self.last = t
+        if not self.stack:
+            self.result = t
+            return
+        frame = self.stack[-1]
+        if frame[0] == "object":
+            if frame[3] is MERGE:
+                self.merge(t)
+                return
+            hint = frame[2]
+            old = hint.get(frame[3])
+            if old is not None and frame[4] and frame[3] in frame[4]:
+                # a key set in the mapping itself replaces the merged one
+                frame[4].discard(frame[3])
+                old = None
+            hint[frame[3]] = t if old is None else merge_types(old, t)
+            frame[3] = None
+        elif frame[1] is not t:
+            frame[1] = merge_types(frame[1], t)
+
+    def expects_key(self):
+        return bool(self.stack) and self.stack[-1][0] == "object" and self.stack[-1][3] is None
+
+    def key(self, name):
+        self.stack[-1][3] = name
+
+    def scalar(self, t):
+        self._value(t)
+
+    def merge(self, t):
+        # the keys of a merged mapping t that the open object does not set itself, several
+        # merges (<<: [*a, *b]) keep the keys of the first mapping that has them
+        frame = self.stack[-1]
+        frame[3] = None
+        if not isinstance(t, TDict) or not t.hint:
+            return
+        if frame[4] is None:
+            frame[4] = set()
+        for key, value in t.hint.items():
+            if key not in frame[2]:
+                frame[2][key] = value
+                frame[4].add(key)
+
+    def start_object(self):
+        self.stack.append(["object", None, {}, None, None])
+
+    def end_object(self):
+        _, _, hint, _, _ = self.stack.pop()
+        if self.stack and self.stack[-1][0] == "array":
+            # one more record of a list of records usually adds nothing to the ones before
+            elem = self.stack[-1][1]
+            if isinstance(elem, TDict) and elem.hint and hint and \
+                    all(merge_types(elem.hint.get(key), t) is elem.hint.get(key) for key, t in hint.items()):
+                self._value(elem)
+                return
+        value_type = None
+        for t in hint.values():
+            value_type = merge_types(value_type, t)
+        self._value(TDict(_STR, value_type if value_type is not None else TVar(), hint))
+
+    def start_array(self):
+        self.stack.append(["array", None, None, None, None])
+
+    def end_array(self):
+        _, elem_type, _, _, _ = self.stack.pop()
+        self._value(TList(elem_type if elem_type is not None else TVar()))
+
+
+def _json_string(token):
+    body = token[1:-1]
+    if "\\" not in body:
+        return body
+    return _JSON_ESCAPES.sub(lambda m: chr(int(m.group(1)[1:], 16)) if m.group(1)[0] == "u" else _ESCAPED.get(m.group(1), m.group(1)), body)
+
+
+def _string_end(buffer, scan):
+    # the closing quote of a string opened before scan, -1 when it is not in the buffer yet
+    while True:
+        end = buffer.find('"', scan)
+        if end < 0:
+            return -1
+        # escaped when an odd number of backslashes precede it, the opening quote stops the count
+        k = end - 1
+        while buffer[k] == "\\":
+            k -= 1
+        if (end - 1 - k) % 2 == 0:
+            return end
+        scan = end + 1
+
+
+def stream_json(f, builder, chunk_size=CHUNK_SIZE):
+    buffer = ""
+    pos = 0
+    eof = False
+    while True:
+        match = _JSON_TOKEN.match(buffer, pos)
+        # a number or literal at the end of the buffer may continue in the next chunk, e.g. 1500|.5
+        if match is None or (match.lastindex > 2 and len(buffer) - match.end() < 32 and not eof):
+            if eof:
+                if buffer[pos:].strip(" \t\r\n,:"):
+                    raise ValueError(f"Invalid JSON near: {buffer[pos:pos + 40]!r}")
+                break
+            if match is None and len(buffer) - _SEPARATORS.match(buffer, pos).end() > 64:
+                raise ValueError(f"Invalid JSON near: {buffer[pos:pos + 40]!r}")
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        kind = match.lastindex
+        token = match.group(kind)
+        if kind == 1:
+            if builder.expects_key():
+                builder.key(token[1:-1])
+            else:
+                builder.scalar(_STR)
+            pos = match.end()
+        elif kind == 3:
+            # floats are int to the engine as well, see rules/core.py
+            builder.scalar(_INT)
+            pos = match.end()
+        elif kind == 4:
+            builder.scalar(_BOOL if token != "null" else _NONE)
+            pos = match.end()
+        elif token != '"':
+            if token == "{":
+                builder.start_object()
+            elif token == "}":
+                builder.end_object()
+            elif token == "[":
+                builder.start_array()
+            else:
+                builder.end_array()
+            pos = match.end()
+        else:
+            key = builder.expects_key()
+            start = match.end() - 1
+            end = _string_end(buffer, start + 1)
+            while end < 0:
+                # the string goes on in the next chunk, the scan resumes where it stopped
+                if eof:
+                    raise ValueError(f"Unterminated JSON string near: {buffer[start:start + 40]!r}")
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                if key:
+                    scan = len(buffer) - start
+                    buffer = buffer[start:] + chunk
+                else:
+                    # the text of a value is never used, only the backslashes that may escape
+                    # a quote at the start of the next chunk are kept
+                    backslashes = len(buffer) - len(buffer.rstrip("\\"))
+                    buffer = '"' + "\\" * backslashes + chunk
+                    scan = 1 + backslashes
+                start = 0
+                end = _string_end(buffer, scan)
+            if key:
+                builder.key(_json_string(buffer[start:end + 1]))
+            else:
+                builder.scalar(_STR)
+            pos = end + 1
+    return builder.result
+
+
+def stream_ijson(f, builder):
+    for _, event, value in ijson.parse(f):
+        if event == "map_key":
+            builder.key(value)
+        elif event == "start_map":
+            builder.start_object()
+        elif event == "end_map":
+            builder.end_object()
+        elif event == "start_array":
+            builder.start_array()
+        elif event == "end_array":
+            builder.end_array()
+        elif event == "string":
+            builder.scalar(_STR)
+        elif event == "number":
+            builder.scalar(_INT)
+        elif event == "boolean":
+            builder.scalar(_BOOL)
+        else:
+            builder.scalar(_NONE)
+    return builder.result
+
+
+_YAML_TAGS = {
+    "tag:yaml.org,2002:int": _INT,
+    "tag:yaml.org,2002:float": _INT,
+    "tag:yaml.org,2002:bool": _BOOL,
+    "tag:yaml.org,2002:null": _NONE,
+}
+
+
+def stream_yaml(f, builder):
+    try:
+        import yaml
+    except ImportError:
+        raise Exception("YAML configs need PyYAML (pip install pyyaml)")
+    resolver = yaml.resolver.Resolver()
+    anchors = {}
+    starts = []     # anchors of the collections being built
+    merges = None   # the aliases of a merge key's sequence, <<: [*a, *b], while it is read
+    for event in yaml.parse(f):
+        if merges is not None:
+            if isinstance(event, yaml.AliasEvent):
+                merges.append(anchors.get(event.anchor))
+                continue
+            if isinstance(event, yaml.SequenceEndEvent):
+                for t in merges:
+                    builder.merge(t)
+                merges = None
+                continue
+            raise Exception(f"A YAML merge key takes mappings or aliases of mappings, not {event}")
+        if isinstance(event, yaml.ScalarEvent):
+            tag = event.tag if event.tag not in (None, "!") else resolver.resolve(yaml.ScalarNode, event.value, event.implicit)
+            if builder.expects_key():
+                # <<: *base merges the keys of base into this mapping, like yaml.safe_load does
+                builder.key(MERGE if tag == "tag:yaml.org,2002:merge" else event.value)
+                continue
+            t = _YAML_TAGS.get(tag, _STR)
+            if event.anchor:
+                anchors[event.anchor] = t
+            builder.scalar(t)
+        elif isinstance(event, yaml.AliasEvent):
+            builder.scalar(anchors.get(event.anchor) or TVar())
+        elif isinstance(event, yaml.MappingStartEvent):
+            starts.append(event.anchor)
+            builder.start_object()
+        elif isinstance(event, yaml.SequenceStartEvent):
+            if builder.stack and builder.stack[-1][3] is MERGE:
+                merges = []
+                continue
+            starts.append(event.anchor)
+            builder.start_array()
+        elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+            if isinstance(event, yaml.MappingEndEvent):
+                builder.end_object()
+            else:
+                builder.end_array()
+            anchor = starts.pop()
+            if anchor:
+                anchors[anchor] = builder.last
+    return builder.result
+
+
+def load_config_type(path):
+    if path.endswith((".yaml", ".yml")):
+        with open(path, "r", encoding="utf-8") as f:
+            return stream_yaml(f, HintBuilder())
+    if ijson is not None:
+        with open(path, "rb") as f:
+            return stream_ijson(f, HintBuilder())
+    if os.path.getsize(path) > LARGE_JSON:
+        warnings.warn(f"{path} is large and ijson is not installed, the fallback tokenizer "
+                      "reads a few MB/s (pip install ijson)")
+    with open(path, "r", encoding="utf-8") as f:
+        return stream_json(f, HintBuilder())
+
+
+def load_hint(path):
+    '''The TDict.hint of the top-level mapping of a JSON or YAML file.'''
+    t = load_config_type(path)
+    if not isinstance(t, TDict):
+        raise Exception(f"{path} does not hold a mapping at the top level")
+    return t.hint
+
+
+if __name__ == "__main__":
+    for key, t in load_hint(sys.argv[1]).items():
+        print(f"{key}: {t}")
@@ -8,9 +8,8 @@ def test_code(code, hint=None):
     node = ast.parse(code)
     inferencer = Inferencer(hint)
     print(ast.dump(node))
-    for stmt in node.body:
+    for stmt, inferred_type in inferencer.infer_module(node):
         # printer.visit(stmt)
-        inferred_type = inferencer.infer(stmt)
         print(f"Inferred type of '{ast.unparse(stmt)}' is: {inferred_type}")
 
 
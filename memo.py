@@ -0,0 +1,162 @@
+import ast
+from typespy import *
+from utils import *
+
+'''
+Memoization of repeated subexpressions, for Inferencer(memo=True).
+
+Generated and config-heavy modules repeat the same expressions over and over, the same
+lambda, my_config.get("k") on every other line. With memo on, the dispatch entries of
+compound expressions are wrapped: every subtree gets a structural shape id (computed once
+per node, bottom-up, so labelling a module is linear), and the result of a subtree is kept
+under its shape together with the env bindings it read. The next subtree of the same shape
+that reads the very same binding objects gets the cached type instead of being inferred:
+
+    f(lambda x: x)        inferred, cached as (t3 -> t3) with t3 local to the subtree
+    f(lambda x: x)        reused, t3 instantiated to a fresh t9 like a real inference would
+
+Variables created inside the subtree are instantiated freshly on every reuse, variables
+that also occur in the bindings it read stay shared, and the current subst is applied, so
+a hit gives the same type a new inference would. Assignments replace bindings and
+compact() replaces the ones it resolves, which simply makes the old entries miss.
+
+The labels are kept in a side table keyed by id(node), cleared once the outermost
+expression is inferred, so the caller's nodes are never written to.
+
+Subtrees made only of constants, such as {"key1": 1, "key2": 2}, are always inferred:
+working out their shape costs more than inferring them. python memobench.py measures it.
+'''
+
+MIN_SIZE = 3  # smaller subtrees are cheaper to infer than to look up
+# shared singleton nodes without children, only their class tells them apart
+_OPERATORS = (ast.expr_context, ast.operator, ast.unaryop, ast.cmpop, ast.boolop)
+
+
+def _is_literal(node):
+    # made of constants only, inferring it is cheaper than working out its shape. Constants
+    # are checked inline, a call per key and value would cost as much as inferring them
+    cls = type(node)
+    if cls is ast.Constant:
+        return True
+    if cls is ast.Dict:
+        children = node.keys + node.values
+    elif cls is ast.List or cls is ast.Tuple or cls is ast.Set:
+        children = node.elts
+    elif cls is ast.UnaryOp:
+        return type(node.operand) is ast.Constant
+    else:
+        return False
+    for child in children:
+        if type(child) is not ast.Constant and (child is None or not _is_literal(child)):
+            return False
+    return True
+
+
+class ExprMemo:
+    def __init__(self):
+        self.shapes = {}   # structure -> (shape id, size, names read, memoizable)
+        self.entries = {}  # shape id -> (bindings read, resolved type, local variables)
+        # id(node) -> (node, shape info) for the outermost expression being inferred and its
+        # subtrees, so the nodes, which belong to the caller, are never written to
+        self.labels = {}
+        self.hits = 0
+        self.misses = 0
+
+    def shape(self, node):
+        label = self.labels.get(id(node))
+        if label is not None and label[0] is node:
+            return label[1]
+        parts = [type(node)]
+        children = []
+        for field in node._fields:
+            value = getattr(node, field, None)
+            if isinstance(value, list):
+                items = []
+                for item in value:
+                    if isinstance(item, _OPERATORS):
+                        items.append(type(item))
+                    elif isinstance(item, ast.AST):
+                        info = self.shape(item)
+                        children.append(info)
+                        items.append(info[0])
+                    else:
+                        items.append(item)
+                parts.append(tuple(items))
+            elif isinstance(value, _OPERATORS):
+                parts.append(type(value))
+            elif isinstance(value, ast.AST):
+                info = self.shape(value)
+                children.append(info)
+                parts.append(info[0])
+            elif value is None or type(value) is str:
+                parts.append(value)
+            else:
+                # the type matters too, 1 == 1.0 == True but they are different literals
+                parts.append((type(value), value))
+        key = tuple(parts)
+        info = self.shapes.get(key)
+        if info is None:
+            # size and names depend on the structure only, so they are worked out once per shape
+            names = {node.id} if isinstance(node, ast.Name) else set()
+            for child in children:
+                names.update(child[2])
+            # a walrus writes to env, reusing its type would skip the write
+            memoizable = not isinstance(node, ast.NamedExpr) and all(child[3] for child in children)
+            size = 1 + sum(child[1] for child in children)
+            info = self.shapes[key] = (len(self.shapes), size, tuple(sorted(names)), memoizable)
+        self.labels[id(node)] = (node, info)
+        return info
+
+    def _bindings(self, inf, names, env):
+        # an imported name reads its import, a later import of the same name makes a miss
+        bindings = [env[name] if name in env else inf.imports.get(name) for name in names]
+        # calls through a dict accessor read that dict too, see rules/dict_access.py
+        for name in names:
+            dict_name = inf.function_retrieves_from.get(name)
+            if dict_name is not None:
+                bindings.append(env.get(dict_name))
+        return bindings
+
+    def _infer(self, handler, inf, node, env):
+        shape_id, size, names, memoizable = self.shape(node)
+        if not memoizable or size < MIN_SIZE:
+            return handler(inf, node, env)
+        bindings = self._bindings(inf, names, env)
+        entry = self.entries.get(shape_id)
+        if entry is not None and len(entry[0]) == len(bindings) and all(a is b for a, b in zip(entry[0], bindings)):
+            self.hits += 1
+            _, template, local = entry
+            if local:
+                template = apply_subst(template, {v: inf.fresh_var() for v in local})
+            return apply_subst(template, inf.subst)
+        self.misses += 1
+        result = handler(inf, node, env)
+        template = apply_subst(result, inf.subst)
+        shared = set()
+        for t in bindings:
+            if t is not None:
+                free_vars(apply_subst(t, inf.subst), shared)
+        local = tuple(free_vars(template, set()) - shared)
+        self.entries[shape_id] = (bindings, template, local)
+        return result
+
+    def wrap(self, handler):
+        def memoized(inf, node, env):
+            if _is_literal(node):
+                return handler(inf, node, env)
+            if self.labels:
+                # a subtree of the expression being inferred, labelled along with it
+                return self._infer(handler, inf, node, env)
+            # the labels of an outermost expression are only needed while it is inferred
+            try:
+                return self._infer(handler, inf, node, env)
+            finally:
+                self.labels.clear()
+        return memoized
+
+    def wrap_table(self, table):
+        # only compound expressions, names and literals are cheaper than a lookup
+        return {key: self.wrap(handler)
+                if isinstance(key, type) and issubclass(key, ast.expr) and key not in (ast.Name, ast.Constant)
+                else handler
+                for key, handler in table.items()}
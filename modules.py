@@ -0,0 +1,188 @@
+import ast
+import os
+import sys
+import threading
+import time
+from typespy import *
+from utils import *
+from rules import DEFAULT_RULES
+from prelude import BUILTINS
+from Inferencer import Inferencer
+
+'''
+Cross-module inference: imports of the modules under a source root resolve to the types
+those modules define.
+
+    modules = ModuleLoader("path/to/repo", rules=RULES)
+    inferencer = Inferencer(rules=RULES, modules=modules)
+    list(inferencer.infer_module(ast.parse("from helpers import parse\nx = parse('3')")))
+
+An import only records what a name stands for (see infer_import in rules/core.py), nothing
+is read. The first time an imported name is looked up, its module is inferred and reduced
+to a summary: every top-level name with its resolved type, encoded like the prelude, plus
+the names it imports itself so re-exports resolve too. The loader keeps the summary for the
+rest of the run, so each module is inferred at most once however many files import it, and
+inferring a whole repository costs one pass over the modules actually reached. Like prelude
+symbols, each lookup instantiates the type variables of a summary type freshly.
+
+Imports alone never load anything, so modules that import each other are fine as long as
+neither needs the other's types while it is being inferred. When one does (a uses b.f at
+the top level and b uses a.g at the top level) that is an import cycle, ImportCycleError
+names it, and every module on the cycle fails instead of being inferred again and again.
+A module that merely uses one on the cycle skips the statements that do, like any other
+statement of a dependency that fails: it is kept in the summary's errors and the rest of
+the module stays usable.
+
+One loader can be shared by Inferencers on several threads: summaries are built under one
+lock, so a module is never inferred twice, and are never mutated afterwards.
+'''
+
+
+# the rules for whole repositories: annotated code is the norm there, see rules/annotations.py
+RULES = ("core", "dict_access", "annotations", "union_values")
+
+
+class ImportCycleError(Exception):
+    def __init__(self, cycle):
+        super().__init__("Import cycle: " + " -> ".join(cycle))
+        self.cycle = cycle  # module names, the first one repeated at the end
+
+
+class ModuleSummary:
+    def __init__(self, name, types, imports, errors):
+        self.name = name
+        self.types = types      # top-level name -> encoded type, see encode_type in utils.py
+        self.imports = imports  # local name -> (module, member or None for the module itself)
+        self.errors = errors    # statements that could not be inferred
+
+    def __repr__(self):
+        return f"ModuleSummary({self.name}, {len(self.types)} names, {len(self.errors)} errors)"
+
+
+class ModuleLoader:
+    def __init__(self, root, rules=DEFAULT_RULES, prelude=BUILTINS):
+        self.root = os.path.abspath(root)
+        self.rules = tuple(rules)
+        self.prelude = prelude
+        self._paths = {}      # module name -> file, or None when there is no such module
+        self._summaries = {}  # module name -> ModuleSummary, or the error it failed with
+        self._loading = []    # modules being inferred right now, innermost last
+        self._lock = threading.RLock()
+        self.inferred = 0     # modules inferred so far
+
+    def path(self, name):
+        # racing threads may both look a path up, they find the same file, so no lock here
+        if name not in self._paths:
+            base = os.path.join(self.root, *name.split("."))
+            path = None
+            for candidate in (base + ".py", os.path.join(base, "__init__.py")):
+                if os.path.isfile(candidate):
+                    path = candidate
+                    break
+            self._paths[name] = path
+        return self._paths[name]
+
+    def is_module(self, name):
+        return all(name.split(".")) and self.path(name) is not None
+
+    def is_package(self, name):
+        path = self.path(name)
+        return path is not None and os.path.basename(path) == "__init__.py"
+
+    def resolve_relative(self, current, level, module):
+        # from .x import y in pkg.mod imports pkg.x, in pkg/__init__.py it imports pkg.x too
+        package = current if self.is_package(current) else current.rpartition(".")[0]
+        parts = package.split(".") if package else []
+        if level - 1 > len(parts) - 1:
+            raise Exception(f"Relative import beyond the top-level package in {current}")
+        parts = parts[:len(parts) - (level - 1)]
+        return ".".join(parts + ([module] if module else []))
+
+    def names(self):
+        # every module under root, e.g. to infer a whole repository
+        for directory, subdirectories, files in os.walk(self.root):
+            subdirectories[:] = sorted(d for d in subdirectories if d.isidentifier())
+            package = os.path.relpath(directory, self.root).replace(os.sep, ".")
+            prefix = "" if package == "." else package + "."
+            for filename in sorted(files):
+                if filename.endswith(".py") and filename[:-3].isidentifier():
+                    name = filename[:-3]
+                    if name == "__init__":
+                        if prefix:
+                            yield prefix[:-1]
+                    else:
+                        yield prefix + name
+
+    def summary(self, name):
+        with self._lock:
+            result = self._summaries.get(name)
+            if result is None:
+                if name in self._loading:
+                    raise ImportCycleError(self._loading[self._loading.index(name):] + [name])
+                self._loading.append(name)
+                try:
+                    result = self._infer(name)
+                except Exception as error:
+                    # remembered, so a module on a cycle or a broken file is tried only once
+                    result = error
+                finally:
+                    self._loading.pop()
+                self._summaries[name] = result
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _infer(self, name):
+        path = self.path(name)
+        if path is None:
+            raise Exception(f"Unknown module {name}")
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), path)
+        self.inferred += 1
+        inferencer = Inferencer(rules=self.rules, prelude=self.prelude, modules=self, module=name)
+        errors = []
+        for stmt in tree.body:
+            try:
+                inferencer.compact((inferencer.infer(stmt),))
+            except ImportCycleError as error:
+                if name in error.cycle:
+                    raise
+                # a module that only uses one on the cycle loses that statement, nothing more
+                errors.append(f"line {stmt.lineno}: {error}")
+            except Exception as error:
+                errors.append(f"line {stmt.lineno}: {error}")
+        # each name is encoded on its own, so its variables are instantiated per lookup
+        types = {n: encode_type(apply_subst(t, inferencer.subst), {}) for n, t in inferencer.env.items()}
+        return ModuleSummary(name, types, dict(inferencer.imports), errors)
+
+    def lookup(self, module, member, new_var):
+        summary = self.summary(module)
+        code = summary.types.get(member)
+        if code is not None:
+            return decode_type(code, new_var)
+        target = summary.imports.get(member)
+        if target is not None and target[1] is not None:
+            # re-exported, e.g. from .parsing import parse in a package's __init__.py
+            source, name = target
+            if self.prelude is not None and self.prelude.is_module(source):
+                if f"{source}.{name}" in self.prelude:
+                    return self.prelude.lookup(f"{source}.{name}", new_var)
+            else:
+                return self.lookup(source, name, new_var)
+        raise Exception(f"Module {module} has no name {member}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python modules.py <source root>")
+        sys.exit(1)
+    loader = ModuleLoader(sys.argv[1], rules=RULES)
+    start = time.perf_counter()
+    for name in loader.names():
+        try:
+            summary = loader.summary(name)
+        except Exception as error:
+            print(f"{name}: {error}")
+            continue
+        print(f"{name}: {len(summary.types)} names, {len(summary.errors)} statements skipped")
+    print(f"Inferred {loader.inferred} modules in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,137 @@
+import ast
+import marshal
+import os
+import sys
+import threading
+from typespy import *
+from utils import *
+from rules.annotations import parse_annotation
+
+'''
+Builtins and stdlib prelude.
+
+The types come from the .pyi stubs in stubs/ (builtins.pyi gives bare names, math.pyi gives
+math.floor, os.path.pyi gives os.path.basename, ...). `python prelude.py` compiles them into
+stubs/prelude.snapshot, a marshal dump of {qualified name: encoded type}. Every symbol is
+marshalled on its own, so loading the snapshot is one file read and no type is decoded
+until it is looked up:
+
+    BUILTINS.lookup("len", inferencer.fresh_var)
+    → (t7 -> int)
+
+Each lookup instantiates the stub's type variables freshly, so len("a") and len(3) do not
+constrain each other.
+'''
+
+STUB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs")
+SNAPSHOT_PATH = os.path.join(STUB_DIR, "prelude.snapshot")
+SNAPSHOT_VERSION = 1
+
+
+def _stub_typevars(tree):
+    # T = TypeVar("T") declares a type variable for the whole stub file
+    names = set()
+    for stmt in tree.body:
+        if (isinstance(stmt, ast.Assign) and
+                isinstance(stmt.value, ast.Call) and
+                isinstance(stmt.value.func, ast.Name) and
+                stmt.value.func.id == "TypeVar"):
+            names.update(t.id for t in stmt.targets if isinstance(t, ast.Name))
+    return names
+
+
+def _stub_symbols(source):
+    tree = ast.parse(source)
+    typevar_names = _stub_typevars(tree)
+    for stmt in tree.body:
+        typevars = {name: TVar(name) for name in typevar_names}
+        try:
+            if isinstance(stmt, ast.FunctionDef):
+                params = stmt.args.posonlyargs + stmt.args.args
+                if len(params) != 1 or stmt.returns is None:
+                    continue
+                arg = params[0]
+                arg_type = parse_annotation(arg.annotation, typevars) if arg.annotation else TVar()
+                yield stmt.name, TFun(arg_type, parse_annotation(stmt.returns, typevars))
+            elif isinstance(stmt, ast.AnnAssign) and isinstance(stmt.target, ast.Name):
+                yield stmt.target.id, parse_annotation(stmt.annotation, typevars)
+        except Exception:
+            # anything the engine cannot express yet is left out of the prelude
+            continue
+
+
+def compile_stubs(stub_dir=STUB_DIR):
+    symbols = {}
+    for filename in sorted(os.listdir(stub_dir)):
+        if not filename.endswith(".pyi"):
+            continue
+        module = filename[:-len(".pyi")]
+        prefix = "" if module == "builtins" else module + "."
+        with open(os.path.join(stub_dir, filename), "r", encoding="utf-8") as f:
+            for name, typ in _stub_symbols(f.read()):
+                symbols[prefix + name] = marshal.dumps(encode_type(typ, {}))
+    return symbols
+
+
+def write_snapshot(path=SNAPSHOT_PATH, stub_dir=STUB_DIR):
+    symbols = compile_stubs(stub_dir)
+    data = marshal.dumps({"version": SNAPSHOT_VERSION, "symbols": symbols})
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(symbols)
+
+
+class Prelude:
+    def __init__(self, path=SNAPSHOT_PATH, stub_dir=STUB_DIR):
+        self.path = path
+        self.stub_dir = stub_dir
+        self._symbols = None
+        self._decoded = {}
+        self._modules = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._symbols is not None:
+                return self._symbols
+            try:
+                with open(self.path, "rb") as f:
+                    data = marshal.loads(f.read())
+                if data.get("version") != SNAPSHOT_VERSION:
+                    raise ValueError("stale prelude snapshot")
+                symbols = data["symbols"]
+            except (OSError, ValueError, EOFError, TypeError):
+                # no usable snapshot, fall back to compiling the stubs in memory
+                symbols = compile_stubs(self.stub_dir)
+            parts = (name.split(".")[:-1] for name in symbols)
+            self._modules = {".".join(p[:i]) for p in parts for i in range(1, len(p) + 1)}
+            self._symbols = symbols
+            return symbols
+
+    def __contains__(self, name):
+        symbols = self._symbols if self._symbols is not None else self._load()
+        return name in symbols
+
+    def is_module(self, name):
+        if self._symbols is None:
+            self._load()
+        return name in self._modules
+
+    def lookup(self, name, new_var):
+        # racing threads may both decode a symbol, they store the same code, so no lock here
+        code = self._decoded.get(name)
+        if code is None:
+            symbols = self._symbols if self._symbols is not None else self._load()
+            code = self._decoded[name] = marshal.loads(symbols[name])
+        return decode_type(code, new_var)
+
+
+BUILTINS = Prelude()
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_PATH
+    count = write_snapshot(path)
+    print(f"Wrote {count} symbols to {path}")
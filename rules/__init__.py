@@ -0,0 +1,75 @@
+'''
+Rule registry for the inference engine.
+
+A rule module maps AST node classes to handlers: handler(inferencer, node, env) -> Type.
+It can also map node classes to check handlers, check(inferencer, node, expected, env) -> Type.
+These push an expected type down into the node instead of synthesizing one. Besides node
+classes, a key can be a hook name such as "returns". The engine calls the hook at a fixed
+point, e.g. to get the declared return type of a function.
+
+Every module registers itself by name with register_rule(). An Inferencer compiles the
+modules it is given into its dispatch tables when it is constructed, so the hot path is a
+single dict lookup on type(node) no matter how many modules are enabled.
+
+Modules register when rules/ is imported, the registry is only read after that, so
+Inferencers on different threads can compile their tables concurrently.
+
+When several modules handle the same key, the module listed last is tried first.
+A handler returns NotImplemented to pass the node on to the module listed before it.
+'''
+import ast
+
+RULES = {}
+
+
+def register_rule(name, handlers, checks=None):
+    RULES[name] = (dict(handlers), dict(checks or {}))
+
+
+def _unknown_node(inferencer, node, env):
+    raise Exception(f"Unknown AST node: {ast.dump(node)}")
+
+
+def _chain(handlers, fallback):
+    def dispatch(inferencer, node, *args):
+        for handler in handlers:
+            result = handler(inferencer, node, *args)
+            if result is not NotImplemented:
+                return result
+        return fallback(inferencer, node, *args)
+    return dispatch
+
+
+def _compile(chains, fallback):
+    table = {}
+    for key, handlers in chains.items():
+        table[key] = handlers[0] if len(handlers) == 1 else _chain(handlers, fallback)
+    return table
+
+
+def compile_rules(names, check_fallback):
+    '''
+    Returns (infer_table, check_table) for the named rule modules. check_fallback is
+    called when no check handler takes a node, usually synthesize and unify.
+    '''
+    # "core" is always the base layer, everything else is stacked on top in order
+    names = ["core"] + [name for name in names if name != "core"]
+    infer_chains = {}
+    check_chains = {}
+    for name in names:
+        if name not in RULES:
+            raise Exception(f"Unknown rule module: {name}")
+        handlers, checks = RULES[name]
+        for key, handler in handlers.items():
+            infer_chains.setdefault(key, []).insert(0, handler)
+        for key, handler in checks.items():
+            check_chains.setdefault(key, []).insert(0, handler)
+
+    # check handlers are always chained, so a lone one can still decline with NotImplemented
+    check_table = {key: _chain(handlers, check_fallback) for key, handlers in check_chains.items()}
+    return _compile(infer_chains, _unknown_node), check_table
+
+
+from rules import core, dict_access, annotations, union_values
+
+DEFAULT_RULES = ("core", "dict_access", "union_values")
@@ -0,0 +1,221 @@
+import ast
+from typespy import *
+from utils import *
+from rules import register_rule
+
+# Core Hindley-Milner rules: literals, names, arithmetic, single-argument lambdas,
+# functions and calls, simple assignments and homogeneous dict literals.
+
+def infer_constant(inf, node, env):
+    # bool has to be checked before int since bool is a subclass of int
+    if isinstance(node.value, bool):
+        return TBool()
+    elif isinstance(node.value, (int, float, complex)):
+        return TInt()
+    elif isinstance(node.value, str):
+        return TStr()
+    elif node.value is None:
+        return TNone()
+    else:
+        raise Exception("Unknown literal type")
+
+def infer_name(inf, node, env):
+    if node.id in env:
+        return env[node.id]
+    elif node.id in inf.imports:
+        return lookup_import(inf, *inf.imports[node.id])
+    elif inf.prelude is not None and node.id in inf.prelude:
+        return inf.prelude.lookup(node.id, inf.fresh_var)
+    else:
+        raise Exception(f"Unbound variable {node.id}")
+
+def dotted_name(node):
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+def infer_attribute(inf, node, env):
+    # module attributes from the prelude, e.g. math.floor or os.path.basename
+    name = dotted_name(node)
+    if name is not None and name.split(".")[0] not in env and inf.prelude is not None and name in inf.prelude:
+        return inf.prelude.lookup(name, inf.fresh_var)
+    if name is not None and name.split(".")[0] not in env:
+        # members of imported modules, import helpers then helpers.parse or pkg.sub.parse
+        parts = name.split(".")
+        for i in range(len(parts) - 1, 0, -1):
+            target = inf.imports.get(".".join(parts[:i]))
+            if target is not None and target[1] is None:
+                return lookup_import(inf, ".".join([target[0]] + parts[i:-1]), parts[-1])
+    raise Exception(f"Unhandled attribute access: {ast.unparse(node)}")
+
+def lookup_import(inf, module, member):
+    # the first lookup of a name from a module under the loader's root infers that module
+    if member is None:
+        raise Exception(f"Module {module} is not a value")
+    if inf.prelude is not None and inf.prelude.is_module(module):
+        if f"{module}.{member}" in inf.prelude:
+            return inf.prelude.lookup(f"{module}.{member}", inf.fresh_var)
+    elif inf.modules is not None and inf.modules.is_module(module):
+        return inf.modules.lookup(module, member, inf.fresh_var)
+    raise Exception(f"Module {module} has no name {member}")
+
+def bind_import(inf, env, name, module, member):
+    # nothing is loaded here, the name only remembers where it comes from
+    env.pop(name, None)
+    inf.imports[name] = (module, member)
+
+def infer_import(inf, node, env):
+    # prelude modules are looked up as math.floor, modules under the loader's root (see
+    # modules.py) are inferred lazily on the first lookup of one of their names
+    for alias in node.names:
+        if alias.asname is None and inf.prelude is not None and inf.prelude.is_module(alias.name):
+            continue
+        if inf.modules is None or not inf.modules.is_module(alias.name):
+            raise Exception(f"Unknown module {alias.name}")
+        bind_import(inf, env, alias.asname or alias.name, alias.name, None)
+    return TNone()
+
+def infer_import_from(inf, node, env):
+    module = node.module
+    if node.level:
+        if inf.modules is None or inf.module is None:
+            raise Exception("Relative import outside a package")
+        module = inf.modules.resolve_relative(inf.module, node.level, node.module)
+    in_prelude = inf.prelude is not None and inf.prelude.is_module(module)
+    if not in_prelude and (inf.modules is None or not inf.modules.is_module(module)):
+        raise Exception(f"Unknown module {module}")
+    for alias in node.names:
+        if alias.name == "*":
+            raise Exception(f"Star imports are not supported: from {module} import *")
+        submodule = f"{module}.{alias.name}"
+        if not in_prelude and inf.modules.is_module(submodule):
+            bind_import(inf, env, alias.asname or alias.name, submodule, None)
+        else:
+            bind_import(inf, env, alias.asname or alias.name, module, alias.name)
+    return TNone()
+
+def infer_binop(inf, node, env):
+    left = inf.infer(node.left, env)
+    right = inf.infer(node.right, env)
+    unify(left, TInt(), inf.subst)
+    unify(right, TInt(), inf.subst)
+    return TInt()
+
+def infer_arg(inf, node, env):
+    # parameters get a fresh variable, rule modules like annotations can do better
+    return inf.fresh_var()
+
+def infer_lambda(inf, node, env):
+    arg = node.args.args[0]
+    arg_type = inf.infer(arg, env)
+    new_env = env.clone()
+    new_env[arg.arg] = arg_type
+    body_type = inf.infer(node.body, new_env)
+    return TFun(apply_subst(arg_type, inf.subst), apply_subst(body_type, inf.subst))
+
+def infer_call(inf, node, env):
+    func_type = inf.infer(node.func, env)
+    arg_type = inf.infer(node.args[0], env)
+    ret_type = inf.fresh_var()
+    unify(func_type, TFun(arg_type, ret_type), inf.subst)
+    return apply_subst(ret_type, inf.subst)
+
+def infer_function_def(inf, node, env): #works for only one arg and a body made of a single return
+    arg = node.args.args[0]
+    arg_type = inf.infer(arg, env)
+    new_env = env.clone()
+    new_env[arg.arg] = arg_type
+    ret_type = inf.declared_return(node, env)
+    if ret_type is None:
+        body_type = inf.infer(node.body[0].value, new_env)
+    else:
+        body_type = inf.check(node.body[0].value, ret_type, new_env)
+    func_type = TFun(apply_subst(arg_type, inf.subst), apply_subst(body_type, inf.subst))
+    env[node.name] = func_type
+    return func_type
+
+def infer_assign(inf, node, env):
+    assert len(node.targets) == 1, "Only single assignments supported"
+    target = node.targets[0]
+    if not isinstance(target, ast.Name):
+        raise Exception("Only simple name assignments supported")
+    value_type = inf.infer(node.value, env)
+    env[target.id] = value_type
+    return value_type
+
+def infer_dict(inf, node, env):
+    if not node.keys:
+        raise Exception("Empty dicts need a hint")
+    key_types = [inf.infer(k, env) for k in node.keys]
+    value_types = [inf.infer(v, env) for v in node.values]
+    # all keys share one type and all values share one type
+    for kt in key_types[1:]:
+        unify(kt, key_types[0], inf.subst)
+    for vt in value_types[1:]:
+        unify(vt, value_types[0], inf.subst)
+    return TDict(apply_subst(key_types[0], inf.subst), apply_subst(value_types[0], inf.subst), inf.hint)
+
+def declared_return(inf, node, env):
+    return None
+
+# Check rules: the expected type is already known, so no fresh variables are needed.
+# Returning NotImplemented falls back to infer() and unify().
+
+def check_constant(inf, node, expected, env):
+    actual = infer_constant(inf, node, env)
+    if type(actual) == type(apply_subst(expected, inf.subst)):
+        return actual
+    return NotImplemented
+
+def check_lambda(inf, node, expected, env):
+    expected = apply_subst(expected, inf.subst)
+    if not isinstance(expected, TFun):
+        return NotImplemented
+    new_env = env.clone()
+    new_env[node.args.args[0].arg] = expected.arg
+    inf.check(node.body, expected.ret, new_env)
+    return apply_subst(expected, inf.subst)
+
+def check_call(inf, node, expected, env):
+    func_type = apply_subst(inf.infer(node.func, env), inf.subst)
+    if not isinstance(func_type, TFun):
+        return NotImplemented
+    inf.check(node.args[0], func_type.arg, env)
+    unify(func_type.ret, expected, inf.subst)
+    return apply_subst(expected, inf.subst)
+
+def check_dict(inf, node, expected, env):
+    expected = apply_subst(expected, inf.subst)
+    if not isinstance(expected, TDict) or not node.keys:
+        return NotImplemented
+    for k, v in zip(node.keys, node.values):
+        inf.check(k, expected.key_type, env)
+        inf.check(v, expected.value_type, env)
+    return TDict(expected.key_type, expected.value_type, inf.hint)
+
+
+register_rule("core", {
+    ast.Constant: infer_constant,
+    ast.Name: infer_name,
+    ast.Attribute: infer_attribute,
+    ast.Import: infer_import,
+    ast.ImportFrom: infer_import_from,
+    ast.BinOp: infer_binop,
+    ast.arg: infer_arg,
+    ast.Lambda: infer_lambda,
+    ast.Call: infer_call,
+    ast.FunctionDef: infer_function_def,
+    ast.Assign: infer_assign,
+    ast.Dict: infer_dict,
+    "returns": declared_return,
+}, checks={
+    ast.Constant: check_constant,
+    ast.Lambda: check_lambda,
+    ast.Call: check_call,
+    ast.Dict: check_dict,
+})
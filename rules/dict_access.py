@@ -0,0 +1,82 @@
+import ast
+from typespy import *
+from utils import *
+from rules import register_rule, core
+
+# Dictionary access: my_config.get(key), my_config[key], a bare my_config.get, and
+# functions that just hand back a value from a dict, e.g.
+#   def get_config_value(key_name): return my_config.get(key_name)
+# Calls of such a function with a string literal use the per-key hint of the dict.
+
+def _dict_value(inf, dict_node, key_node, env):
+    dict_type = inf.infer(dict_node, env)
+    if isinstance(dict_type, TDict):
+        key_type = inf.infer(key_node, env)
+        unify(key_type, dict_type.key_type, inf.subst)
+        return apply_subst(dict_type.value_type, inf.subst)
+    else:
+        raise Exception(f".get called on non-dictionary type: {dict_type}")
+
+def _hinted_value(inf, node, env):
+    if not (isinstance(node.func, ast.Name) and
+            len(node.args) == 1 and
+            isinstance(node.args[0], ast.Constant) and
+            isinstance(node.args[0].value, str)):
+        return None
+    dict_name = inf.function_retrieves_from.get(node.func.id)
+    if dict_name is None or dict_name not in env:
+        return None
+    dict_type = env[dict_name]
+    if isinstance(dict_type, TDict) and dict_type.hint:
+        return dict_type.hint.get(node.args[0].value)
+    return None
+
+def infer_call(inf, node, env):
+    if isinstance(node.func, ast.Attribute) and node.func.attr == "get":
+        return _dict_value(inf, node.func.value, node.args[0], env)
+    ret_type = core.infer_call(inf, node, env)
+    hinted = _hinted_value(inf, node, env)
+    return ret_type if hinted is None else hinted
+
+def check_call(inf, node, expected, env):
+    # .get and hinted lookups have their own result types, check them after the fact
+    if isinstance(node.func, ast.Attribute) and node.func.attr == "get":
+        return inf.subsume(node, expected, env)
+    if isinstance(node.func, ast.Name) and node.func.id in inf.function_retrieves_from:
+        return inf.subsume(node, expected, env)
+    return NotImplemented
+
+def infer_subscript(inf, node, env):
+    return _dict_value(inf, node.value, node.slice, env)
+
+def infer_attribute(inf, node, env):
+    name = core.dotted_name(node.value)
+    if name is not None and name.split(".")[0] not in env:
+        return NotImplemented # not a dict, maybe a module from the prelude
+    val_type = inf.infer(node.value, env)
+    if isinstance(val_type, TDict) and node.attr == "get":
+        return TFun(val_type.key_type, TUnion([val_type.value_type, TNone()]))
+    raise Exception(f"Unhandled attribute access: {node.attr} on {val_type}")
+
+def infer_function_def(inf, node, env):
+    # only records which dict the function reads from, the core rule infers the type
+    if len(node.body) == 1 and isinstance(node.body[0], ast.Return):
+        ret_expr = node.body[0].value
+        if (isinstance(ret_expr, ast.Call) and
+                isinstance(ret_expr.func, ast.Attribute) and
+                ret_expr.func.attr == "get" and
+                isinstance(ret_expr.func.value, ast.Name)):
+            inf.function_retrieves_from[node.name] = ret_expr.func.value.id
+        elif isinstance(ret_expr, ast.Subscript) and isinstance(ret_expr.value, ast.Name):
+            inf.function_retrieves_from[node.name] = ret_expr.value.id
+    return NotImplemented
+
+
+register_rule("dict_access", {
+    ast.Call: infer_call,
+    ast.Subscript: infer_subscript,
+    ast.Attribute: infer_attribute,
+    ast.FunctionDef: infer_function_def,
+}, checks={
+    ast.Call: check_call,
+})
@@ -0,0 +1,33 @@
+import ast
+from typespy import *
+from utils import *
+from rules import register_rule
+
+# Heterogeneous dict literals: {"key1": "dfd", "key2": 10} is Dict[str, str | int]
+# instead of a type mismatch.
+
+def make_union(types, subst):
+    unique = []
+    for t in types:
+        t_applied = apply_subst(t, subst)
+        if not any(t_applied == u for u in unique): #save only unique, similar to not t_applied in set(unique)
+            unique.append(t_applied)
+    if len(unique) == 1:
+        return unique[0]
+    else:
+        return TUnion(unique)
+
+def infer_dict(inf, node, env):
+    if not node.keys:
+        raise Exception("Empty dicts need a hint")
+    key_types = [inf.infer(k, env) for k in node.keys]
+    value_types = [inf.infer(v, env) for v in node.values]
+    # unify all key types (assuming same key type, e.g., str)
+    for kt in key_types[1:]:
+        unify(kt, key_types[0], inf.subst)
+    return TDict(apply_subst(key_types[0], inf.subst), make_union(value_types, inf.subst), inf.hint)
+
+
+register_rule("union_values", {
+    ast.Dict: infer_dict,
+})
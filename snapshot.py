@@ -0,0 +1,85 @@
+import marshal
+import mmap
+import os
+import threading
+from typespy import *
+from utils import *
+
+'''
+Snapshot: the state of an Inferencer (env, subst, function_retrieves_from, imports and the
+variable supply) as one compact marshal blob, so a shared base such as a big config module is
+inferred once and every dependent file starts from it:
+
+    base = Inferencer(rules=RULES)
+    list(base.infer_module(ast.parse(config_source)))
+    base.snapshot().save("config.snapshot")
+
+    snapshot = Snapshot.load("config.snapshot")
+    inferencer = Inferencer(rules=RULES).restore(snapshot)
+
+env is stored resolved against subst, types are encoded with encode_type (see utils.py)
+over one variable table, so variables shared between names stay shared after a restore.
+
+The blob is decoded on the first restore only. Types are never mutated, so every later
+restore shares the decoded types and only copies the env and subst dicts. load() maps the
+file read-only, so processes reading the same snapshot share its pages, and workers forked
+after a restore share the decoded types as well.
+'''
+
+SNAPSHOT_VERSION = 1
+
+
+class Snapshot:
+    def __init__(self, data):
+        self.data = data  # bytes, or the mmap of a snapshot file
+        self._state = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def capture(cls, inferencer):
+        var_ids = {}
+        env = {name: encode_type(apply_subst(t, inferencer.subst), var_ids) for name, t in inferencer.env.items()}
+        subst = tuple((encode_type(v, var_ids), encode_type(t, var_ids)) for v, t in inferencer.subst.items())
+        names = [None] * len(var_ids)
+        for v, i in var_ids.items():
+            names[i] = v.name
+        return cls(marshal.dumps({
+            "version": SNAPSHOT_VERSION,
+            "env": env,
+            "subst": subst,
+            "function_retrieves_from": dict(inferencer.function_retrieves_from),
+            "imports": dict(inferencer.imports),
+            "variables": tuple(names),
+            "next_var": max([inferencer.next_var] + [v.id + 1 for v in var_ids]),
+        }))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.data)
+        os.replace(tmp_path, path)
+
+    def state(self):
+        '''(env, subst, function_retrieves_from, imports, holders, next_var) with decoded types, shared by all restores.'''
+        with self._lock:
+            if self._state is None:
+                data = marshal.loads(self.data)
+                if data.get("version") != SNAPSHOT_VERSION:
+                    raise Exception(f"Snapshot version {data.get('version')} is not {SNAPSHOT_VERSION}")
+                # variables keep their names, a restored Inferencer numbers new ones after them
+                variables = {i: TVar(name) for i, name in enumerate(data["variables"])}
+                env = {name: decode_type(code, TVar, variables) for name, code in data["env"].items()}
+                subst = {variables[v]: decode_type(code, TVar, variables) for v, code in data["subst"]}
+                holders = {}
+                for name, t in env.items():
+                    for v in free_vars(t, set()):
+                        holders.setdefault(v, set()).add(name)
+                # snapshots from before cross-module imports have none
+                imports = data.get("imports", {})
+                self._state = (env, subst, data["function_retrieves_from"], imports, holders, data["next_var"])
+            return self._state
@@ -0,0 +1,60 @@
+import ast
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typespy import *
+from Inferencer import *
+
+# Many modules inferred at once from a thread pool must come out exactly as when they are
+# inferred one after the other. Variables are numbered per Inferencer, so even their names
+# have to match. Run with a free-threaded build (python3.13t) to see it scale.
+
+RULES = ("core", "dict_access", "annotations", "union_values")
+
+
+def make_module(i):
+    return f"""
+import os
+import math
+my_config = {{"key1": "v{i}", "key2": {i}}}
+def get_config_value(key_name):
+    return my_config.get(key_name)
+value = get_config_value("key2")
+f = lambda x: lambda y: x
+g = f({i})
+def add(x: int) -> int:
+    return x + {i}
+h = add(len("abc"))
+p = os.path.basename("a/b")
+r = math.floor
+""" + "\n".join(f"v{j} = add({j})" for j in range(50))
+
+
+def infer_module(source):
+    inferencer = Inferencer(hint={"key1": TStr(), "key2": TInt()}, rules=RULES)
+    return [str(t) for _, t in inferencer.infer_module(ast.parse(source))] + \
+           [f"{name}: {t}" for name, t in sorted(inferencer.env.items())]
+
+
+if __name__ == "__main__":
+    modules = [make_module(i) for i in range(400)]
+
+    # the threaded runs go first, so they also race on the cold prelude
+    runs = {}
+    for workers in (8, 4, 2):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            runs[workers] = (list(pool.map(infer_module, modules)), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    expected = [infer_module(m) for m in modules]
+    print(f"sequential: {time.perf_counter() - start:.2f}s")
+
+    for workers, (results, elapsed) in runs.items():
+        mismatches = sum(r != e for r, e in zip(results, expected))
+        print(f"{workers} threads: {elapsed:.2f}s, {mismatches} modules differ")
+        if mismatches:
+            sys.exit(1)
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"GIL {'enabled' if gil else 'disabled'}, {len(modules)} modules agree")
@@ -0,0 +1,34 @@
+# Builtins the engine can express: single-argument functions over int, str, bool, None,
+# list, dict and unions. Multi-argument functions are left out until calls support them.
+from typing import TypeVar
+
+T = TypeVar("T")
+K = TypeVar("K")
+V = TypeVar("V")
+
+def len(obj: T) -> int: ...
+def str(obj: T) -> str: ...
+def repr(obj: T) -> str: ...
+def ascii(obj: T) -> str: ...
+def int(x: T) -> int: ...
+def bool(x: T) -> bool: ...
+def hash(obj: T) -> int: ...
+def id(obj: T) -> int: ...
+def callable(obj: T) -> bool: ...
+def print(value: T) -> None: ...
+def input(prompt: str) -> str: ...
+def abs(x: int) -> int: ...
+def round(x: int) -> int: ...
+def ord(c: str) -> int: ...
+def chr(i: int) -> str: ...
+def bin(x: int) -> str: ...
+def oct(x: int) -> str: ...
+def hex(x: int) -> str: ...
+def list(iterable: list[T]) -> list[T]: ...
+def sorted(iterable: list[T]) -> list[T]: ...
+def sum(iterable: list[int]) -> int: ...
+def min(iterable: list[T]) -> T: ...
+def max(iterable: list[T]) -> T: ...
+def any(iterable: list[T]) -> bool: ...
+def all(iterable: list[T]) -> bool: ...
+def dict(mapping: dict[K, V]) -> dict[K, V]: ...
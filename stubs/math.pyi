@@ -0,0 +1,7 @@
+def floor(x: int) -> int: ...
+def ceil(x: int) -> int: ...
+def trunc(x: int) -> int: ...
+def factorial(x: int) -> int: ...
+def isqrt(n: int) -> int: ...
+def isfinite(x: int) -> bool: ...
+def isnan(x: int) -> bool: ...
@@ -0,0 +1,10 @@
+def basename(p: str) -> str: ...
+def dirname(p: str) -> str: ...
+def abspath(path: str) -> str: ...
+def normpath(path: str) -> str: ...
+def expanduser(path: str) -> str: ...
+def exists(path: str) -> bool: ...
+def isfile(path: str) -> bool: ...
+def isdir(path: str) -> bool: ...
+def isabs(s: str) -> bool: ...
+def getsize(filename: str) -> int: ...
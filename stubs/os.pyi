@@ -0,0 +1,2 @@
+def getenv(key: str) -> str | None: ...
+def listdir(path: str) -> list[str]: ...
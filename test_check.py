@@ -0,0 +1,31 @@
+import ast
+import pytest
+from typespy import *
+from Inferencer import *
+
+# Check mode: annotated return types pushed down into function bodies. Run with python -m pytest.
+
+RULES = ("core", "dict_access", "annotations", "union_values")
+
+
+def infer(source):
+    return [str(t) for _, t in Inferencer(rules=RULES).infer_module(ast.parse(source))]
+
+
+def test_union_member_arguments_must_match():
+    with pytest.raises(Exception, match="Type mismatch"):
+        infer('def f(x) -> dict[str, int] | None: return {"a": "b"}')
+
+
+def test_union_members():
+    assert infer('def f(x) -> dict[str, int] | None: return {"a": 1}') == ["(t0 -> Dict[str, int] | None)"]
+    assert infer('def f(x) -> dict[str, int] | None: return None') == ["(t0 -> Dict[str, int] | None)"]
+    assert infer('def f(x) -> int | str: return "a"') == ["(t0 -> int | str)"]
+
+
+def test_union_member_that_fits_is_found():
+    # the first dict member does not fit and must not leave any binding behind
+    assert infer('def f(x) -> dict[str, int] | dict[str, str]: return {"a": "b"}') == \
+        ["(t0 -> Dict[str, int] | Dict[str, str])"]
+    # the member that fits binds the variables of the value
+    assert infer('def f(x) -> dict[str, int] | None: return {"a": x}') == ["(int -> Dict[str, int] | None)"]
@@ -0,0 +1,37 @@
+import pytest
+from confighints import load_hint
+
+# Run with python -m pytest.
+
+CONFIG = """
+base: &base
+  timeout: 5
+  host: "localhost"
+extra: &extra
+  host: 3
+  debug: true
+service:
+  <<: *base
+  retries: 3
+both:
+  timeout: "slow"
+  <<: [*base, *extra]
+override:
+  <<: *base
+  host: 7
+"""
+
+
+def types(hint):
+    return {key: str(t) for key, t in hint.items()}
+
+
+def test_yaml_merge_key(tmp_path):
+    pytest.importorskip("yaml")
+    path = tmp_path / "config.yaml"
+    path.write_text(CONFIG)
+    hint = load_hint(str(path))
+    assert types(hint["service"].hint) == {"timeout": "int", "host": "str", "retries": "int"}
+    # keys of the mapping itself win, then the first merged mapping that has the key
+    assert types(hint["both"].hint) == {"timeout": "str", "host": "str", "debug": "bool"}
+    assert types(hint["override"].hint) == {"timeout": "int", "host": "int"}
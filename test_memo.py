@@ -0,0 +1,32 @@
+import ast
+import re
+from Inferencer import *
+
+# Run with python -m pytest.
+
+RULES = ("core", "dict_access", "annotations", "union_values")
+SOURCE = 'my_config = {"key1": "v", "key2": "w"}\n' + "\n".join(
+    f'v{i} = (lambda x: lambda y: x)((lambda z: z)(my_config.get("key1")))' for i in range(20))
+
+
+def renamed(t):
+    # a memo hit numbers its fresh variables differently, the types agree up to renaming
+    names = {}
+    return re.sub(r"\bt\d+\b", lambda m: names.setdefault(m.group(), f"v{len(names)}"), str(t))
+
+
+def infer(tree, memo):
+    inferencer = Inferencer(rules=RULES, memo=memo)
+    return [renamed(t) for _, t in inferencer.infer_module(tree)], inferencer
+
+
+def test_memo_leaves_the_tree_alone():
+    tree = ast.parse(SOURCE)
+    before = [(node, dict(vars(node))) for node in ast.walk(tree)]
+    memoized, inferencer = infer(tree, True)
+    assert inferencer.memo.hits > 0
+    assert not inferencer.memo.labels
+    for node, attributes in before:
+        assert vars(node) == attributes
+    # the same tree inferred again, with and without memo, gives the same types
+    assert memoized == infer(tree, False)[0] == infer(tree, True)[0]
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+from modules import ModuleLoader, RULES
+from typeindex import IndexBuilder, TypeIndex
+
+# Run with python -m pytest.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def make_repo(root):
+    (root / "pkg").mkdir(parents=True)
+    (root / "pkg" / "__init__.py").write_text("")
+    (root / "pkg" / "convert.py").write_text("def to_int(s: str) -> int:\n    return len(s)\n")
+    (root / "config.py").write_text(
+        "from pkg.convert import to_int\n"
+        'my_config = {"timeout": "10", "retries": 3}\n'
+        "def get_config_value(key_name):\n    return my_config.get(key_name)\n"
+        'retries = to_int("3")\n')
+
+
+def typeindex(*args):
+    result = subprocess.run([sys.executable, os.path.join(HERE, "typeindex.py"), *map(str, args)],
+                            capture_output=True, text=True, check=True)
+    return result.stdout.splitlines()
+
+
+def test_readme_queries(tmp_path):
+    make_repo(tmp_path / "repo")
+    index = tmp_path / "corpus.idx"
+    built = typeindex("build", index, tmp_path / "repo")
+    # config imports pkg.convert, which the loader infers once for both
+    assert built == ["Indexed 4 symbols from 3 modules into " + str(index)]
+    assert typeindex("type", index, "str -> int") == ["pkg.convert.to_int"]
+    assert typeindex("returns", index, "get_config_value") == ["('config.get_config_value', 'int | str')"]
+    assert typeindex("exports", index, "pkg/convert.py") == ["('pkg.convert.to_int', '(str -> int)')"]
+    assert typeindex("of", index, "retries") == ["('config.retries', 'int')"]
+
+
+def test_summaries_are_indexed_without_inferring_again(tmp_path):
+    make_repo(tmp_path / "repo")
+    loader = ModuleLoader(str(tmp_path / "repo"), rules=RULES)
+    builder = IndexBuilder()
+    for name in loader.names():
+        builder.add_summary(loader.summary(name), name)
+    builder.write(str(tmp_path / "corpus.idx"))
+    assert loader.inferred == 3
+    index = TypeIndex(str(tmp_path / "corpus.idx"))
+    assert index.symbols_of_type("str -> int") == ["pkg.convert.to_int"]
+    index.close()
@@ -0,0 +1,121 @@
+import ast
+import collections
+from typespy import *
+from utils import *
+
+'''
+Structured trace of unification, for Inferencer(trace=True).
+
+Nothing here is touched unless tracing is on: a plain Inferencer keeps a plain dict as
+subst and the raw dispatch tables. With tracing, the tables are wrapped so the tracer knows
+which node is being inferred, and subst becomes a TracedSubst that records every binding
+as an event in a bounded ring buffer:
+
+    ("bind", node, var, type)       unify bound var to type while inferring node
+    ("define", node, name, type)    a statement gave name its type
+    ("error", node, message)        inferring node raised, e.g. a type mismatch
+
+explain(name) follows the variables of name's definition through the bindings to tell
+why it ended up with its type, without rerunning anything.
+'''
+
+class Tracer:
+    def __init__(self, capacity=10000):
+        self.events = collections.deque(maxlen=capacity)
+        self.nodes = []
+
+    def current(self):
+        return self.nodes[-1] if self.nodes else None
+
+    def wrap(self, handler):
+        def traced(inferencer, node, *args):
+            self.nodes.append(node)
+            try:
+                result = handler(inferencer, node, *args)
+            except Exception as e:
+                if not getattr(e, "traced", False):
+                    e.traced = True
+                    self.events.append(("error", node, str(e)))
+                raise
+            finally:
+                self.nodes.pop()
+            if isinstance(node, (ast.Assign, ast.AnnAssign, ast.FunctionDef)):
+                self.events.append(("define", node, _defined_name(node), result))
+            return result
+        return traced
+
+    def explain(self, name):
+        events = list(self.events)
+        start = None
+        for i in range(len(events) - 1, -1, -1):
+            if events[i][0] == "define" and events[i][2] == name:
+                start = i
+                break
+        if start is None:
+            return [f"{name}: no definition in the trace"]
+        _, node, _, t = events[start]
+        lines = [f"{_where(node)}: {name} defined as {t.pretty()}"]
+
+        # the bindings made inside the definition, then every binding of a variable that
+        # is still reachable from it, oldest first
+        inside = {id(n) for n in ast.walk(node)}
+        pending = free_vars(t, set())
+        seen = set()
+        bindings = {}
+        relevant = []
+        for i, event in enumerate(events[:start]):
+            if event[0] != "bind":
+                continue
+            if id(event[1]) in inside:
+                relevant.append((i, event))
+                seen.add(event[2])
+                free_vars(event[3], pending)
+            bindings.setdefault(event[2], []).append((i, event))
+        for i, event in enumerate(events[start:], start):
+            if event[0] == "bind":
+                bindings.setdefault(event[2], []).append((i, event))
+        while pending:
+            v = pending.pop()
+            if v in seen:
+                continue
+            seen.add(v)
+            for i, event in bindings.get(v, ()):
+                relevant.append((i, event))
+                free_vars(event[3], pending)
+        relevant.sort(key=lambda item: item[0])
+        for _, (_, node, var, bound) in relevant:
+            lines.append(f"{_where(node)}: {var.pretty()} := {bound.pretty()}")
+        for event in events[start + 1:]:
+            if event[0] == "error" and name in _names_in(event[1]):
+                lines.append(f"{_where(event[1])}: error, {event[2]}")
+        return lines
+
+
+class TracedSubst(dict):
+    # only single bindings go through here, compaction uses update() and is not recorded
+    def __init__(self, tracer, *args):
+        super().__init__(*args)
+        self.tracer = tracer
+
+    def __setitem__(self, var, t):
+        dict.__setitem__(self, var, t)
+        self.tracer.events.append(("bind", self.tracer.current(), var, t))
+
+
+def _defined_name(node):
+    if isinstance(node, ast.FunctionDef):
+        return node.name
+    target = node.targets[0] if isinstance(node, ast.Assign) else node.target
+    return target.id if isinstance(target, ast.Name) else ast.unparse(target)
+
+def _names_in(node):
+    if node is None:
+        return set()
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name)} | {getattr(node, "name", None)}
+
+def _where(node):
+    if node is None:
+        return "?"
+    text = ast.unparse(node).splitlines()[0]
+    line = getattr(node, "lineno", None)
+    return f"line {line} `{text}`" if line else f"`{text}`"
@@ -0,0 +1,344 @@
+import ast
+import mmap
+import os
+import re
+import struct
+import sys
+from typespy import *
+from utils import decode_type
+
+'''
+Symbol/type index over inference results, queried without rerunning inference.
+
+    builder = IndexBuilder()
+    builder.add_module("config", "config.py", inferencer.env)
+    builder.add_file("repo/pkg/utils.py", root="repo")   # module pkg.utils, file pkg/utils.py
+    builder.add_summary(loader.summary("pkg.io"), "pkg/io.py")  # a ModuleLoader's, see modules.py
+    builder.write("corpus.idx")
+
+    index = TypeIndex("corpus.idx")
+    index.type_of("config.get_config_value")   → "(str -> int | str)"
+    index.symbols_of_type("str -> int")        → ["utils.to_int", ...]
+    index.return_type("get_config_value")      → [("config.get_config_value", "int | str")]
+    index.exports("config.py")                 → [("config.my_config", "Dict[str, int | str]"), ...]
+
+Types are canonicalized before they are stored, so (t3 -> t3) and (t8 -> t8) are the same
+type "(a -> a)" and unions compare regardless of member order.
+
+The file is memory-mapped and never loaded as a whole. It holds a string table, the
+symbols sorted by qualified name, and three sorted key -> postings sections (canonical
+type, file, short name) whose postings are symbol numbers. Every query is a binary search
+over fixed-size records, so it stays in the milliseconds however big the corpus is.
+'''
+
+MAGIC = b"PTIX"
+VERSION = 1
+_HEADER = struct.Struct("<4sII" + "I" * 9)
+_SYMBOL = struct.Struct("<III")      # name offset, name length, type key number
+_KEY = struct.Struct("<IIII")        # key offset, key length, postings start, postings count
+_POSTING = struct.Struct("<I")
+
+
+def canonical(t: Type) -> str:
+    names = {}
+
+    def walk(t):
+        if isinstance(t, TVar):
+            if t not in names:
+                names[t] = _var_name(len(names))
+            return names[t]
+        elif isinstance(t, TFun):
+            return f"({walk(t.arg)} -> {walk(t.ret)})"
+        elif isinstance(t, TDict):
+            return f"Dict[{walk(t.key_type)}, {walk(t.value_type)}]"
+        elif isinstance(t, TList):
+            return f"List[{walk(t.elem_type)}]"
+        elif isinstance(t, TUnion):
+            return " | ".join(sorted(set(walk(o) for o in t.options)))
+        return t.pretty()
+    return walk(t)
+
+
+def _var_name(i):
+    return chr(ord("a") + i) if i < 26 else f"t{i}"
+
+
+_TYPE_TOKEN = re.compile(r"\s*(->|[()\[\],|]|[A-Za-z_][A-Za-z0-9_]*)")
+_BASE = {"int": TInt, "str": TStr, "bool": TBool, "None": TNone}
+
+
+def parse_type(text: str) -> Type:
+    '''Parse the pretty form, "str -> int", "(a -> a)", "Dict[str, int | str]", back into a Type.'''
+    tokens = _TYPE_TOKEN.findall(text)
+    if "".join(tokens) != re.sub(r"\s+", "", text):
+        raise ValueError(f"Cannot parse type: {text}")
+    pos = 0
+    variables = {}
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take(expected=None):
+        nonlocal pos
+        token = peek()
+        if token is None or (expected is not None and token != expected):
+            raise ValueError(f"Cannot parse type: {text}")
+        pos += 1
+        return token
+
+    def arrow():
+        arg = union()
+        if peek() == "->":
+            take()
+            return TFun(arg, arrow())
+        return arg
+
+    def union():
+        options = [atom()]
+        while peek() == "|":
+            take()
+            options.append(atom())
+        return options[0] if len(options) == 1 else TUnion(options)
+
+    def atom():
+        token = take()
+        if token == "(":
+            t = arrow()
+            take(")")
+            return t
+        if token in ("Dict", "dict"):
+            take("[")
+            key = arrow()
+            take(",")
+            value = arrow()
+            take("]")
+            return TDict(key, value)
+        if token in ("List", "list"):
+            take("[")
+            elem = arrow()
+            take("]")
+            return TList(elem)
+        if token in _BASE:
+            return _BASE[token]()
+        if not re.match(r"[A-Za-z_]", token):
+            raise ValueError(f"Cannot parse type: {text}")
+        if token not in variables:
+            variables[token] = TVar(token)
+        return variables[token]
+
+    t = arrow()
+    if pos != len(tokens):
+        raise ValueError(f"Cannot parse type: {text}")
+    return t
+
+
+def module_name(path, root):
+    '''Dotted name of a source file under root, pkg/sub/m.py is pkg.sub.m and pkg/__init__.py is pkg.'''
+    relative = os.path.relpath(os.path.abspath(path), os.path.abspath(root))
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        raise Exception(f"{path} is not under {root}")
+    parts = os.path.splitext(relative)[0].split(os.sep)
+    if parts[-1] == "__init__" and len(parts) > 1:
+        parts.pop()
+    return ".".join(parts)
+
+
+class IndexBuilder:
+    def __init__(self):
+        self.symbols = {}  # qualified name -> (canonical type, file)
+
+    def add_module(self, module, path, env):
+        for name, t in env.items():
+            self.symbols[f"{module}.{name}"] = (canonical(t), path)
+
+    def add_summary(self, summary, path):
+        '''The top-level names of a ModuleSummary, so a module the loader inferred is not inferred again.'''
+        self.add_module(summary.name, path, {name: decode_type(code, TVar) for name, code in summary.types.items()})
+
+    def add_file(self, path, module=None, inferencer_factory=None, root="."):
+        '''
+        Infer a source file statement by statement, statements that fail are skipped. The
+        module is named after the path relative to root, so a/utils.py and b/utils.py stay
+        apart, and the file is indexed under that relative path. Without inferencer_factory
+        it is inferred with the rules of modules.py, annotations included.
+        '''
+        from Inferencer import Inferencer
+        from modules import RULES
+        if module is None:
+            module = module_name(path, root)
+        inferencer = inferencer_factory() if inferencer_factory else Inferencer(rules=RULES)
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        path = os.path.relpath(os.path.abspath(path), os.path.abspath(root)).replace(os.sep, "/")
+        for stmt in tree.body:
+            try:
+                inferencer.infer(stmt)
+            except Exception:
+                continue
+            inferencer.compact()
+        self.add_module(module, path, inferencer.env)
+
+    def write(self, path):
+        strings = bytearray()
+        offsets = {}
+
+        def intern(s):
+            if s not in offsets:
+                data = s.encode("utf-8")
+                offsets[s] = (len(strings), len(data))
+                strings.extend(data)
+            return offsets[s]
+
+        names = sorted(self.symbols)
+        number = {name: i for i, name in enumerate(names)}
+        by_type, by_file, by_short = {}, {}, {}
+        for name in names:
+            t, file = self.symbols[name]
+            by_type.setdefault(t, []).append(number[name])
+            by_file.setdefault(file, []).append(number[name])
+            by_short.setdefault(name.rsplit(".", 1)[-1], []).append(number[name])
+        type_keys = sorted(by_type)
+        type_number = {t: i for i, t in enumerate(type_keys)}
+
+        symbol_table = bytearray()
+        for name in names:
+            offset, length = intern(name)
+            symbol_table += _SYMBOL.pack(offset, length, type_number[self.symbols[name][0]])
+
+        postings = bytearray()
+        sections = []
+        for mapping in (by_type, by_file, by_short):
+            records = bytearray()
+            for key in sorted(mapping):
+                offset, length = intern(key)
+                records += _KEY.pack(offset, length, len(postings) // _POSTING.size, len(mapping[key]))
+                for symbol in mapping[key]:
+                    postings += _POSTING.pack(symbol)
+            sections.append(records)
+
+        body = [bytes(strings), bytes(symbol_table)] + [bytes(s) for s in sections] + [bytes(postings)]
+        position = _HEADER.size
+        starts = []
+        for part in body:
+            starts.append(position)
+            position += len(part)
+        header = _HEADER.pack(MAGIC, VERSION, len(names),
+                              starts[0], starts[1], starts[2], starts[3], starts[4], starts[5],
+                              len(by_type), len(by_file), len(by_short))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            for part in body:
+                f.write(part)
+        os.replace(tmp_path, path)
+        return len(names)
+
+
+class TypeIndex:
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.count, self._strings, self._symbols, types, files, shorts,
+         self._postings_start, type_count, file_count, short_count) = _HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise Exception(f"{path} is not a type index of version {VERSION}")
+        self._sections = {"type": (types, type_count), "file": (files, file_count), "short": (shorts, short_count)}
+
+    def close(self):
+        self.data.close()
+        self._file.close()
+
+    def _string(self, offset, length):
+        start = self._strings + offset
+        return self.data[start:start + length].decode("utf-8")
+
+    def _symbol(self, i):
+        offset, length, type_key = _SYMBOL.unpack_from(self.data, self._symbols + i * _SYMBOL.size)
+        return self._string(offset, length), type_key
+
+    def _key(self, section, i):
+        start, _ = self._sections[section]
+        return _KEY.unpack_from(self.data, start + i * _KEY.size)
+
+    def _find(self, count, key_at, key):
+        # binary search over sorted fixed-size records
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < count and key_at(lo) == key else None
+
+    def _type_string(self, type_key):
+        offset, length, _, _ = self._key("type", type_key)
+        return self._string(offset, length)
+
+    def _postings(self, section, key):
+        _, count = self._sections[section]
+        i = self._find(count, lambda j: self._string(*self._key(section, j)[:2]), key)
+        if i is None:
+            return []
+        _, _, start, n = self._key(section, i)
+        return [_POSTING.unpack_from(self.data, self._postings_start + (start + k) * _POSTING.size)[0] for k in range(n)]
+
+    def type_of(self, qualified_name):
+        i = self._find(self.count, lambda j: self._symbol(j)[0], qualified_name)
+        return None if i is None else self._type_string(self._symbol(i)[1])
+
+    def lookup(self, name):
+        '''[(qualified name, type)] for a qualified name or for a bare name in any module.'''
+        if "." in name:
+            t = self.type_of(name)
+            return [] if t is None else [(name, t)]
+        return [(qualified, self._type_string(type_key))
+                for qualified, type_key in map(self._symbol, self._postings("short", name))]
+
+    def symbols_of_type(self, type_text):
+        return [self._symbol(i)[0] for i in self._postings("type", canonical(parse_type(type_text)))]
+
+    def return_type(self, name):
+        results = []
+        for qualified, t in self.lookup(name):
+            parsed = parse_type(t)
+            if isinstance(parsed, TFun):
+                results.append((qualified, canonical(parsed.ret)))
+        return results
+
+    def exports(self, path):
+        return [(qualified, self._type_string(type_key))
+                for qualified, type_key in map(self._symbol, self._postings("file", path))]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == "build" and os.path.isdir(sys.argv[3]):
+        from modules import ModuleLoader, RULES
+        # imports between the indexed modules resolve through the loader, see modules.py, and
+        # its summaries are what gets indexed, so every module is inferred once
+        root = sys.argv[3]
+        loader = ModuleLoader(root, rules=RULES)
+        builder = IndexBuilder()
+        if len(sys.argv) > 4:
+            names = [module_name(path, root) for path in sys.argv[4:]]
+        else:
+            names = list(loader.names())
+        for name in names:
+            try:
+                summary = loader.summary(name)
+            except Exception as error:
+                print(f"{name}: {error}")
+                continue
+            path = os.path.relpath(loader.path(name), loader.root).replace(os.sep, "/")
+            builder.add_summary(summary, path)
+        print(f"Indexed {builder.write(sys.argv[2])} symbols from {loader.inferred} modules into {sys.argv[2]}")
+    elif len(sys.argv) == 4 and sys.argv[1] in ("type", "of", "returns", "exports"):
+        index = TypeIndex(sys.argv[2])
+        query = {"type": index.symbols_of_type, "of": index.lookup,
+                 "returns": index.return_type, "exports": index.exports}[sys.argv[1]]
+        for result in query(sys.argv[3]):
+            print(result)
+    else:
+        print("Usage: python typeindex.py build <index> <root> [<file.py>...]")
+        print("       python typeindex.py type|of|returns|exports <index> <query>")
+        sys.exit(1)
@@ -1,4 +1,5 @@
 import itertools
+import threading
 
 class Type:
     def __str__(self):
@@ -9,11 +10,16 @@ class Type:
 
 
 class TVar(Type):
+    # variables made during inference are numbered by their Inferencer (see fresh_var), this
+    # shared supply only numbers the others (stubs, snapshots, config hints)
     _id_iter = itertools.count()
+    _id_lock = threading.Lock()
 
-    def __init__(self, name=None):
-        # print(TVar._id_iter)
-        self.id = next(TVar._id_iter)
+    def __init__(self, name=None, id=None):
+        if id is None:
+            with TVar._id_lock:
+                id = next(TVar._id_iter)
+        self.id = id
         self.name = name or f't{self.id}'
 
     def pretty(self):
@@ -39,10 +45,33 @@ class TStr(Type):
     def pretty(self):
         return "str"
 
+class TNone(Type):
+    def pretty(self):
+        return "None"
+
+class TList(Type):
+    def __init__(self, elem_type):
+        self.elem_type = elem_type
+
+    def pretty(self):
+        return f"List[{self.elem_type.pretty()}]"
+
 
 class TypeEnv(dict):
+    # written collects the names assigned since the inferencer last compacted
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.written = set(self)
+
+    def __setitem__(self, name, t):
+        dict.__setitem__(self, name, t)
+        self.written.add(name)
+
     def clone(self):
-        return TypeEnv(self)
+        # a local scope, only the top-level env is compacted, so it starts with nothing written
+        env = TypeEnv()
+        dict.update(env, self)
+        return env
 
 class TDict(Type):
     def __init__(self, key_type, value_type, hint=None):
@@ -64,7 +93,7 @@ class TUnion(Type):
         if len(new_set) > 1:
             return " | ".join(map(str, self.options))
         else:
-            return self.options[0]
+            return str(self.options[0])
     def __eq__(self, other):
         return isinstance(other, TUnion) and set(self.options) == set(other.options)
 
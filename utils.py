@@ -8,7 +8,6 @@ class ASTPrinter(ast.NodeVisitor):
 
 def occurs_check(v: TVar, typ: Type, subst: dict):
     typ = apply_subst(typ, subst)
-    # print("after check apply subst: ",typ, v, typ, subst)
     if typ == v:
         return True
     elif isinstance(typ, TFun):
@@ -22,17 +21,14 @@ subst = { TVar('a'): TInt() }
 '''
 
 def unify(t1: Type, t2: Type, subst: dict):
-    # print("before unify: ",t1, t2)
     t1 = apply_subst(t1, subst)
     t2 = apply_subst(t2, subst)
-    # print("after unify: ",t1, t2)
 
     if isinstance(t1, TVar):
         if t1 != t2:
             if occurs_check(t1, t2, subst):
                 raise Exception("Recursive unification")
             subst[t1] = t2
-            # print("substitute created: ",t1,subst)
     elif isinstance(t2, TVar):
         unify(t2, t1, subst)
     elif isinstance(t1, TFun) and isinstance(t2, TFun):
@@ -41,6 +37,21 @@ def unify(t1: Type, t2: Type, subst: dict):
     elif type(t1) != type(t2):
         raise Exception(f"Type mismatch: {t1.pretty()} vs {t2.pretty()}")
 
+def unify_nested(t1: Type, t2: Type, subst: dict):
+    # unify leaves the key/value types of dicts and the elements of lists alone, this one
+    # unifies them too, e.g. to tell which member of a union a dict really is
+    unify(t1, t2, subst)
+    t1 = apply_subst(t1, subst)
+    t2 = apply_subst(t2, subst)
+    if isinstance(t1, TFun) and isinstance(t2, TFun):
+        unify_nested(t1.arg, t2.arg, subst)
+        unify_nested(t1.ret, t2.ret, subst)
+    elif isinstance(t1, TDict) and isinstance(t2, TDict):
+        unify_nested(t1.key_type, t2.key_type, subst)
+        unify_nested(t1.value_type, t2.value_type, subst)
+    elif isinstance(t1, TList) and isinstance(t2, TList):
+        unify_nested(t1.elem_type, t2.elem_type, subst)
+
 
 '''
 If the type is a variable (TVar) and has a substitution, recursively looks up in subst for its final replacement.
@@ -55,11 +66,88 @@ apply_subst(t, subst)
 def apply_subst(t: Type, subst: dict):
 
     if isinstance(t, TVar):
-        # print("checking instance",t)
         replacement = subst.get(t, t)
         if replacement == t:
             return t
         return apply_subst(replacement, subst)
     elif isinstance(t, TFun):
         return TFun(apply_subst(t.arg, subst), apply_subst(t.ret, subst))
+    elif isinstance(t, TDict):
+        return TDict(apply_subst(t.key_type, subst), apply_subst(t.value_type, subst), t.hint)
+    elif isinstance(t, TUnion):
+        return TUnion([apply_subst(o, subst) for o in t.options])
+    elif isinstance(t, TList):
+        return TList(apply_subst(t.elem_type, subst))
     return t
+
+
+'''
+free_vars(t, acc): collects the type variables that appear in t (without applying any substitution) into acc.
+free_vars(TFun(TVar('a'), TDict(TStr(), TVar('b'))), set())
+→ {a, b}
+'''
+
+def free_vars(t: Type, acc: set):
+    if isinstance(t, TVar):
+        acc.add(t)
+    elif isinstance(t, TFun):
+        free_vars(t.arg, acc)
+        free_vars(t.ret, acc)
+    elif isinstance(t, TDict):
+        free_vars(t.key_type, acc)
+        free_vars(t.value_type, acc)
+    elif isinstance(t, TList):
+        free_vars(t.elem_type, acc)
+    elif isinstance(t, TUnion):
+        for o in t.options:
+            free_vars(o, acc)
+    return acc
+
+'''
+encode_type(t, var_ids) / decode_type(code, new_var): a compact, marshal-friendly form of a type.
+Base types become their name, variables a small int (numbered through var_ids), and the
+others tuples: ("->", arg, ret), ("dict", key, value), ("list", elem), ("|", *options). A dict
+with a hint carries it as a fourth item, ((key, type), ...).
+decode_type calls new_var once per distinct variable, so every decode gets fresh variables.
+encode_type(TFun(TVar(), TInt()), {})
+→ ("->", 0, "int")
+'''
+
+_BASE_TYPES = {"int": TInt, "str": TStr, "bool": TBool, "None": TNone}
+
+def encode_type(t: Type, var_ids: dict):
+    if isinstance(t, TVar):
+        return var_ids.setdefault(t, len(var_ids))
+    elif isinstance(t, TFun):
+        return ("->", encode_type(t.arg, var_ids), encode_type(t.ret, var_ids))
+    elif isinstance(t, TDict):
+        code = ("dict", encode_type(t.key_type, var_ids), encode_type(t.value_type, var_ids))
+        if t.hint:
+            code += (tuple((key, encode_type(h, var_ids)) for key, h in t.hint.items()),)
+        return code
+    elif isinstance(t, TList):
+        return ("list", encode_type(t.elem_type, var_ids))
+    elif isinstance(t, TUnion):
+        return ("|",) + tuple(encode_type(o, var_ids) for o in t.options)
+    return t.pretty()
+
+def decode_type(code, new_var, variables=None):
+    if variables is None:
+        variables = {}
+    if isinstance(code, int):
+        if code not in variables:
+            variables[code] = new_var()
+        return variables[code]
+    elif isinstance(code, str):
+        return _BASE_TYPES[code]()
+    tag = code[0]
+    if tag == "->":
+        return TFun(decode_type(code[1], new_var, variables), decode_type(code[2], new_var, variables))
+    elif tag == "dict":
+        hint = {key: decode_type(h, new_var, variables) for key, h in code[3]} if len(code) > 3 else None
+        return TDict(decode_type(code[1], new_var, variables), decode_type(code[2], new_var, variables), hint)
+    elif tag == "list":
+        return TList(decode_type(code[1], new_var, variables))
+    elif tag == "|":
+        return TUnion([decode_type(c, new_var, variables) for c in code[1:]])
+    raise Exception(f"Unknown type code: {code}")